@@ -0,0 +1,81 @@
+import csv
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# (bottom_type, bottom_color)
+Bottom = Tuple[str, str]
+
+
+class AlternativesIndex:
+    """
+    Good combinations from the training CSV, indexed by top_type and by
+    (top_type, top_color). The file is re-read when its mtime changes.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._by_top_type: Dict[str, List[Bottom]] = {}
+        self._by_top: Dict[Tuple[str, str], List[Bottom]] = {}
+        self._reload_if_changed(force=True)
+
+    def _load(self):
+        by_top_type: Dict[str, List[Bottom]] = {}
+        by_top: Dict[Tuple[str, str], List[Bottom]] = {}
+        with open(self.path, newline='') as file:
+            for row in csv.DictReader(file):
+                if row.get('good_combination', '').strip() != '1':
+                    continue
+                bottom = (row['bottom_type'], row['bottom_color'])
+                # Keep CSV order so the first good row is still the default choice
+                by_top_type.setdefault(row['top_type'], []).append(bottom)
+                by_top.setdefault((row['top_type'], row['top_color']), []).append(bottom)
+
+        # Swap both maps at once so readers never see a half-built index
+        self._by_top_type, self._by_top = by_top_type, by_top
+
+    def _reload_if_changed(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return  # Keep serving the last good copy
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+
+    def candidates(self, top_type: str, top_color: Optional[str] = None) -> List[Bottom]:
+        """Good bottoms for this top, exact color matches first"""
+        self._reload_if_changed()
+        exact = self._by_top.get((top_type, top_color), []) if top_color is not None else []
+        rest = [bottom for bottom in self._by_top_type.get(top_type, []) if bottom not in exact]
+        return exact + rest
+
+    def best_alternative(self, top_type: str, top_color: Optional[str] = None,
+                         score: Optional[Callable[[Sequence[Bottom]], Sequence[float]]] = None) -> Optional[Bottom]:
+        """
+        Pick one alternative bottom. Without a scorer this is the first matching
+        row; with one, the candidate the scorer rates highest.
+        """
+        candidates = self.candidates(top_type, top_color)
+        if not candidates:
+            return None
+        if score is None or len(candidates) == 1:
+            return candidates[0]
+
+        scores = score(candidates)
+        best = max(range(len(candidates)), key=lambda i: scores[i])
+        return candidates[best]
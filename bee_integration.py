@@ -1,13 +1,71 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from pydantic import BaseModel
-import httpx
 import json
+import os
+import secrets
+from contextlib import AsyncExitStack, asynccontextmanager
 from typing import Dict, Any, List, Optional
-
-app = FastAPI()
+from mcp_client import MCPClient, MCPServerError
+from response_cache import ResponseCache, outfit_cache_key
+from metrics import Metrics, MetricsMiddleware, CONTENT_TYPE, cache_collector
+from tracing import TracingMiddleware, collector, exporter_from_env
+from fastapi.responses import PlainTextResponse
 
 # Configuration
-MCP_SERVER_URL = "http://localhost:8000/mcp"
+MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:8000/mcp")
+
+# Token required by GET /traces, sent as X-Admin-Token. Unset means it is refused
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# One client for the app's lifetime so connections are reused between requests.
+# MCP_TRANSPORT=asgi or direct calls main.py in-process when both run together.
+mcp_client = MCPClient(
+    MCP_SERVER_URL,
+    transport=os.environ.get("MCP_TRANSPORT", "http"),
+    max_connections=int(os.environ.get("MCP_MAX_CONNECTIONS", 100)),
+    max_keepalive_connections=int(os.environ.get("MCP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+    timeout=float(os.environ.get("MCP_TIMEOUT", 5.0)),
+    retries=int(os.environ.get("MCP_RETRIES", 2)),
+    backoff=float(os.environ.get("MCP_RETRY_BACKOFF", 0.05)),
+)
+
+# Evaluations from the MCP server for repeated outfits, keyed by the model
+# version that gave them and cleared when it changes. In-process that is
+# main's current version; over http it is the version the server reported
+# on its last response, so a reload is noticed on the next cache miss and
+# entries served before that are bounded by the TTL.
+evaluation_cache = ResponseCache(
+    max_size=int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("BEE_CACHE_TTL", 60)),
+    version=lambda: mcp_client.model_version,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncExitStack() as stack:
+        if mcp_client.transport != "http":
+            # In-process transports never start main.app on their own, so run
+            # its lifespan here: warmup, the model watch for hot reloads, the
+            # request log and the inference pool's shutdown
+            import main
+            await stack.enter_async_context(main.lifespan(main.app))
+        await mcp_client.start()
+        stack.push_async_callback(mcp_client.close)
+        yield
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-stage and per-endpoint timings, served on /metrics
+metrics = Metrics("bee")
+metrics.add_collector(cache_collector(evaluation_cache))
+app.add_middleware(MetricsMiddleware, metrics=metrics, paths=lambda: [route.path for route in app.routes])
+
+# Spans for validate, forward and format (TRACING=memory or file); the
+# forward call carries the trace on to the MCP server
+trace_exporter = exporter_from_env()
+if trace_exporter is not None:
+    app.add_middleware(TracingMiddleware, service="bee-adapter", exporter=trace_exporter,
+                       sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 1.0)))
 
 class BeeRequest(BaseModel):
     type: str
@@ -31,15 +89,16 @@ async def evaluate_outfit(request: BeeRequest):
         content = request.content
         
         # Validate required fields
-        required_fields = ["top_type", "top_color", "bottom_type", "bottom_color"]
-        for field in required_fields:
-            if field not in content:
-                return {
-                    "action": "final_answer",
-                    "action_input": {
-                        "answer": f"I need to know the {field} to evaluate the outfit. Please provide this information."
-                    }
+        with metrics.stage("validate"):
+            missing = [field for field in ["top_type", "top_color", "bottom_type", "bottom_color"] if field not in content]
+        for field in missing:
+            metrics.count_error("missing_field")
+            return {
+                "action": "final_answer",
+                "action_input": {
+                    "answer": f"I need to know the {field} to evaluate the outfit. Please provide this information."
                 }
+            }
         
         # Forward request to MCP server
         mcp_request = MCPRequest(
@@ -52,44 +111,48 @@ async def evaluate_outfit(request: BeeRequest):
             }
         )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                MCP_SERVER_URL,
-                json=mcp_request.dict()
-            )
-            
-            if response.status_code != 200:
-                return {
-                    "action": "final_answer",
-                    "action_input": {
-                        "answer": "I encountered an error while evaluating your outfit combination. Please try again later."
-                    }
+        try:
+            with metrics.stage("forward"):
+                key = outfit_cache_key(mcp_request.action_input)
+                if key is None:
+                    outfit_eval = await mcp_client.call(mcp_request.action, mcp_request.action_input)
+                else:
+                    outfit_eval = await evaluation_cache.get_or_compute(
+                        (mcp_client.model_version,) + key,
+                        lambda: mcp_client.call(mcp_request.action, mcp_request.action_input)
+                    )
+        except MCPServerError:
+            metrics.count_error("mcp_server")
+            return {
+                "action": "final_answer",
+                "action_input": {
+                    "answer": "I encountered an error while evaluating your outfit combination. Please try again later."
                 }
-            
-            mcp_response = response.json()
-            outfit_eval = mcp_response["response"]
-            
+            }
+
+        with metrics.stage("format"):
             # Craft a response for the user
             if outfit_eval["is_good_combination"]:
                 result = f"👍 Great choice! Your {content['top_color']} {content['top_type']} and {content['bottom_color']} {content['bottom_type']} make a good combination."
             else:
                 result = f"🤔 The combination of {content['top_color']} {content['top_type']} with {content['bottom_color']} {content['bottom_type']} could be improved."
-                
+
             # Add suggestions
             suggestions = "\n\nSuggestions:\n"
             for i, suggestion in enumerate(outfit_eval["suggestions"], 1):
                 suggestions += f"{i}. {suggestion}\n"
-                
+
             final_answer = result + suggestions
-            
-            return {
-                "action": "final_answer",
-                "action_input": {
-                    "answer": final_answer
-                }
+
+        return {
+            "action": "final_answer",
+            "action_input": {
+                "answer": final_answer
             }
-            
+        }
+
     except Exception as e:
+        metrics.count_error("exception")
         return {
             "action": "final_answer",
             "action_input": {
@@ -97,6 +160,29 @@ async def evaluate_outfit(request: BeeRequest):
             }
         }
 
+def check_admin_token(x_admin_token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: ADMIN_TOKEN is not set")
+    # Header values are decoded as latin-1, so this recovers the bytes sent
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode("latin-1"), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/traces")
+async def get_traces(trace_id: Optional[str] = None, limit: int = 50, x_admin_token: Optional[str] = Header(None)):
+    """Recent traces from the in-memory collector (TRACING=memory), newest first"""
+    check_admin_token(x_admin_token)
+    return {"enabled": trace_exporter is not None, "traces": collector().find(trace_id, limit)}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Evaluation cache hit, miss and eviction counters"""
+    return evaluation_cache.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of stage timings, request counts and cache stats"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
 # Define the tool specifications for the Bee Framework
 @app.get("/tools")
 async def get_tools():
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+MCP_URL = "http://localhost:8000"
+BEE_URL = "http://localhost:8001"
+
+FIELDS = ["top_type", "top_color", "bottom_type", "bottom_color"]
+
+# Upper edges of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+# === Outfit mix ===
+
+def load_outfits(path: str = "clothing_combinations.csv") -> List[Dict[str, str]]:
+    with open(path, newline="") as file:
+        return [{field: row[field] for field in FIELDS} for row in csv.DictReader(file)]
+
+
+def outfit_mix(outfits: List[Dict[str, str]], n: int, recombine: float = 0.5,
+               unknown: float = 0.02, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    Sample n outfits from the CSV rows. A share of them pair the top of one
+    row with the bottom of another, and a few use an item the model doesn't
+    know, so every response path gets exercised.
+    """
+    rng = random.Random(seed)
+    mix = []
+    for _ in range(n):
+        outfit = dict(rng.choice(outfits))
+        if rng.random() < recombine:
+            other = rng.choice(outfits)
+            outfit["bottom_type"], outfit["bottom_color"] = other["bottom_type"], other["bottom_color"]
+        if rng.random() < unknown:
+            outfit["top_color"] = "unknown_color"
+        mix.append(outfit)
+    return mix
+
+
+# === Targets ===
+
+def mcp_request(outfit):
+    return "/mcp", {"action": "evaluate_outfit", "action_input": outfit}
+
+
+def predict_request(outfit):
+    return "/v1/models/clothing-advisor:predict", {"inputs": outfit}
+
+
+def bee_request(outfit):
+    return "/tools/evaluateOutfit", {"type": "action_input", "content": outfit}
+
+
+TARGETS = {
+    "mcp": (mcp_request, MCP_URL),
+    "predict": (predict_request, MCP_URL),
+    "bee": (bee_request, BEE_URL),
+}
+
+
+def in_process_client(target: str) -> httpx.AsyncClient:
+    """ASGI client for the app behind a target, with no network involved"""
+    if target == "bee":
+        # The Bee adapter calls main.app in-process too
+        os.environ.setdefault("MCP_TRANSPORT", "asgi")
+        import bee_integration
+        app = bee_integration.app
+    else:
+        import main
+        app = main.app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+
+
+# === Load test ===
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def histogram(latencies_ms: List[float]) -> Dict[str, int]:
+    counts = {f"le_{edge}": 0 for edge in HISTOGRAM_BUCKETS_MS}
+    counts["le_inf"] = 0
+    for latency in latencies_ms:
+        for edge in HISTOGRAM_BUCKETS_MS:
+            if latency <= edge:
+                counts[f"le_{edge}"] += 1
+                break
+        else:
+            counts["le_inf"] += 1
+    return counts
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered), 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 50), 3),
+            "p95": round(percentile(ordered, 95), 3),
+            "p99": round(percentile(ordered, 99), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0,
+        },
+        "histogram_ms": histogram(ordered),
+    }
+
+
+async def run_load(client: httpx.AsyncClient, build_request: Callable, outfits: List[Dict[str, str]],
+                   concurrency: int, rate: Optional[float]) -> Dict[str, Any]:
+    """
+    Send every outfit with at most `concurrency` requests in flight. With a
+    rate, request starts are paced to that many per second (open loop).
+    """
+    latencies_ms: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for outfit in outfits:
+        queue.put_nowait(outfit)
+
+    start = time.perf_counter()
+    interval = 1.0 / rate if rate else 0.0
+    next_slot = [start]
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                outfit = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if interval:
+                slot = next_slot[0]
+                next_slot[0] += interval
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            path, payload = build_request(outfit)
+            sent = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies_ms.append((time.perf_counter() - sent) * 1000)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies_ms, errors, time.perf_counter() - start)
+
+
+async def load_command(args) -> Dict[str, Any]:
+    outfits = outfit_mix(load_outfits(args.csv), args.requests, args.recombine, args.unknown, args.seed)
+    results = {}
+    for target in args.targets:
+        build_request, default_url = TARGETS[target]
+        if args.in_process:
+            client = in_process_client(target)
+        else:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            client = httpx.AsyncClient(base_url=args.url or default_url, limits=limits, timeout=30.0)
+
+        async with client:
+            # Warm connections and caches so they don't skew the numbers
+            await run_load(client, build_request, outfits[:min(len(outfits), args.concurrency)], args.concurrency, None)
+            results[target] = await run_load(client, build_request, outfits, args.concurrency, args.rate)
+
+        summary = results[target]
+        latency = summary["latency_ms"]
+        print(f"{target:8s} {summary['throughput_rps']:>9.1f} req/s  p50 {latency['p50']:.3f} ms  "
+              f"p95 {latency['p95']:.3f} ms  p99 {latency['p99']:.3f} ms  errors {summary['errors']}")
+    return results
+
+
+# === Micro-benchmarks ===
+
+def time_call(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Per-call time in microseconds over `repeat` calls"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    samples.sort()
+    return {"mean_us": round(statistics.fmean(samples), 3), "p50_us": round(percentile(samples, 50), 3),
+            "p99_us": round(percentile(samples, 99), 3)}
+
+
+def micro_command(args) -> Dict[str, Any]:
+    import main
+
+    active = main.model_holder.current
+    outfits = outfit_mix(load_outfits(args.csv), 256, args.recombine, 0.0, args.seed)
+    outfit = outfits[0]
+    X, valid = main.encode_outfits(outfits, active)
+    row = X[:1]
+
+    benchmarks: Dict[str, Callable[[], Any]] = {
+        "encode_one": lambda: main.encode_outfit(outfit, active),
+        "encode_batch_256": lambda: main.encode_outfits(outfits, active),
+        "model_predict_proba_one": lambda: active.model.predict_proba(row),
+        "model_predict_proba_256": lambda: active.model.predict_proba(X),
+        "suggestions_good": lambda: main.build_outfit_response(outfit, 1, 0.9, active),
+        "suggestions_bad": lambda: main.build_outfit_response(outfit, 0, 0.1, active),
+        "evaluate_outfit_uncached": lambda: main.score_outfit(outfit, active),
+    }
+    if active.prediction_table is not None:
+        benchmarks["table_lookup_one"] = lambda: active.prediction_table.lookup(row[0])
+        benchmarks["table_lookup_256"] = lambda: active.prediction_table.lookup_many(X[valid])
+
+    results = {}
+    for name, fn in benchmarks.items():
+        results[name] = time_call(fn, args.repeat)
+        print(f"{name:28s} mean {results[name]['mean_us']:>10.2f} us  p50 {results[name]['p50_us']:>10.2f} us  "
+              f"p99 {results[name]['p99_us']:>10.2f} us")
+    return results
+
+
+# === Comparing runs ===
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """
+    Print latency changes against a saved run (p95/p99 for load tests, p50
+    for micro-benchmarks). Returns False if any grew more than threshold.
+    """
+    ok = True
+    for target, summary in current.get("load", {}).items():
+        before = baseline.get("load", {}).get(target)
+        if not before:
+            continue
+        for key in ("p95", "p99"):
+            old, new = before["latency_ms"][key], summary["latency_ms"][key]
+            change = (new - old) / old if old else 0.0
+            flag = "REGRESSION" if change > threshold else ""
+            ok = ok and change <= threshold
+            print(f"{target:8s} {key} {old:.3f} -> {new:.3f} ms ({change:+.1%}) {flag}")
+
+    for name, timing in current.get("micro", {}).items():
+        before = baseline.get("micro", {}).get(name)
+        if not before:
+            continue
+        old, new = before["p50_us"], timing["p50_us"]
+        change = (new - old) / old if old else 0.0
+        flag = "REGRESSION" if change > threshold else ""
+        ok = ok and change <= threshold
+        print(f"{name:28s} p50 {old:.2f} -> {new:.2f} us ({change:+.1%}) {flag}")
+    return ok
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Load tests and micro-benchmarks for the clothing advisor")
+    parser.add_argument("--csv", default="clothing_combinations.csv", help="Outfits to sample from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recombine", type=float, default=0.5, help="Share of outfits mixing two CSV rows")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare latencies against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed latency growth before failing")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="Drive the HTTP endpoints")
+    load.add_argument("--target", dest="targets", action="append", choices=sorted(TARGETS),
+                      help="Endpoint to drive, may be repeated (default: all)")
+    load.add_argument("--in-process", action="store_true", help="Call the ASGI apps directly, no network")
+    load.add_argument("--url", help="Base URL (defaults to the local server for each target)")
+    load.add_argument("--requests", type=int, default=2000)
+    load.add_argument("--concurrency", type=int, default=32)
+    load.add_argument("--rate", type=float, help="Requests per second (default: as fast as possible)")
+    load.add_argument("--unknown", type=float, default=0.02, help="Share of outfits with an unknown item")
+
+    micro = commands.add_parser("micro", help="Time encoding, inference and suggestions on their own")
+    micro.add_argument("--repeat", type=int, default=2000)
+
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Any] = {
+        "command": args.command,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+    }
+    if args.command == "load":
+        args.targets = args.targets or ["mcp", "predict", "bee"]
+        results["config"] = {"requests": args.requests, "concurrency": args.concurrency, "rate": args.rate,
+                             "in_process": args.in_process, "targets": args.targets}
+        results["load"] = asyncio.run(load_command(args))
+    else:
+        results["config"] = {"repeat": args.repeat}
+        results["micro"] = micro_command(args)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            if not compare(results, json.load(file), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
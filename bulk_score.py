@@ -0,0 +1,124 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from ndjson_records import merge_results, parse_ndjson_line, split_records
+
+FIELDS = ["top_type", "top_color", "bottom_type", "bottom_color"]
+RESULT_FIELDS = ["is_good_combination", "confidence", "message", "suggestions"]
+
+
+def score_records(records: List[Any]) -> List[Dict[str, Any]]:
+    """evaluate_outfits over one chunk, with parse errors kept in place"""
+    import main
+    return merge_results(records, main.evaluate_outfits(split_records(records)), main.error_response)
+
+
+def _score_jsonl_chunk(lines: List[str]) -> List[Dict[str, Any]]:
+    return score_records([parse_ndjson_line(line) for line in lines])
+
+
+def _score_csv_chunk(rows: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    return score_records(rows)
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[tuple]:
+    """Yield (rows, scorer) chunks without reading the whole file"""
+    if path.endswith(".csv"):
+        with open(path, newline="") as file:
+            rows = ({field: row.get(field) or "" for field in FIELDS} for row in csv.DictReader(file))
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield chunk, _score_csv_chunk
+    else:
+        with open(path) if path != "-" else sys.stdin as file:
+            lines = (line for line in file if line.strip())
+            while True:
+                chunk = list(islice(lines, chunk_size))
+                if not chunk:
+                    return
+                yield chunk, _score_jsonl_chunk
+
+
+class ResultWriter:
+    """Writes results as JSONL, or as CSV when the output path ends in .csv"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", newline="") if path != "-" else sys.stdout
+        self.csv = csv.writer(self.file) if path.endswith(".csv") else None
+        if self.csv:
+            self.csv.writerow(RESULT_FIELDS)
+
+    def write(self, results: Iterable[Dict[str, Any]]):
+        for result in results:
+            if self.csv:
+                self.csv.writerow([result["is_good_combination"], result["confidence"],
+                                   result["message"], " | ".join(result["suggestions"])])
+            else:
+                self.file.write(json.dumps(result))
+                self.file.write("\n")
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def _init_worker():
+    # Load the model once per worker process (a memory-mapped artifact is shared)
+    import main  # noqa: F401
+
+
+def bulk_score(input_path: str, output_path: str, chunk_size: int = 10_000, workers: int = 0) -> int:
+    """
+    Score a CSV or JSONL file in chunks across a process pool. At most two
+    chunks per worker are in flight and results are written in input order,
+    so memory stays bounded however large the file is. Returns the row count.
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = ResultWriter(output_path)
+    count = 0
+    try:
+        if workers == 1:
+            for chunk, scorer in read_chunks(input_path, chunk_size):
+                writer.write(scorer(chunk))
+                count += len(chunk)
+            return count
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            in_flight = deque()
+            for chunk, scorer in read_chunks(input_path, chunk_size):
+                in_flight.append((len(chunk), pool.submit(scorer, chunk)))
+                if len(in_flight) >= workers * 2:
+                    size, future = in_flight.popleft()
+                    writer.write(future.result())
+                    count += size
+            while in_flight:
+                size, future = in_flight.popleft()
+                writer.write(future.result())
+                count += size
+        return count
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a large CSV or JSONL file of outfits")
+    parser.add_argument("input", help="CSV with outfit columns, or JSONL with one outfit per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output, or CSV if it ends in .csv (default stdout)")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = bulk_score(args.input, args.output, args.chunk_size, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)", file=sys.stderr)
@@ -0,0 +1,71 @@
+import json
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+DEFAULT_RULES_PATH = 'color_rules.json'
+
+# Rendered suggestions are memoized per (top_color, bottom_color) up to this
+# many pairs; colors reaching the rules are already checked against the
+# model's vocabulary, so this is only a guard
+MAX_RENDERED_PAIRS = 100_000
+
+
+class ColorRules:
+    """
+    Color compatibility rules compiled from color_rules.json.
+
+    Every pair rule is indexed by the frozenset of its two colors, so all
+    matching templates for a color pair are one dict lookup however many
+    pairs the file lists. The rendered suggestions for each (top, bottom)
+    pair are memoized, so repeat calls return the same tuple.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.neutral_colors: FrozenSet[str] = frozenset(rules.get('neutral_colors', ()))
+        self.same_color: str = rules.get('same_color', '')
+        self.all_neutral: str = rules.get('all_neutral', '')
+        self.fallback: str = rules.get('fallback', '')
+
+        # frozenset({color, color}) -> templates in file order
+        by_pair: Dict[FrozenSet[str], List[str]] = {}
+        for rule in rules.get('pair_rules', ()):
+            for pair in rule['pairs']:
+                by_pair.setdefault(frozenset(pair), []).append(rule['template'])
+        self.pair_templates: Dict[FrozenSet[str], Tuple[str, ...]] = {
+            pair: tuple(templates) for pair, templates in by_pair.items()
+        }
+
+        self.bottom_tips: Dict[str, Tuple[str, ...]] = {
+            bottom_type: (tip,) for bottom_type, tip in rules.get('bad_combination_bottom_tips', {}).items()
+        }
+        self._rendered: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
+    def _render(self, top_color: str, bottom_color: str) -> Tuple[str, ...]:
+        suggestions = []
+        if top_color == bottom_color and self.same_color:
+            suggestions.append(self.same_color)
+        for template in self.pair_templates.get(frozenset((top_color, bottom_color)), ()):
+            suggestions.append(template.format(top_color=top_color, bottom_color=bottom_color))
+        if top_color in self.neutral_colors and bottom_color in self.neutral_colors and self.all_neutral:
+            suggestions.append(self.all_neutral)
+        if not suggestions and self.fallback:  # If no specific rules matched
+            suggestions.append(self.fallback.format(top_color=top_color, bottom_color=bottom_color))
+        return tuple(suggestions)
+
+    def suggestions(self, top_color: str, bottom_color: str) -> Tuple[str, ...]:
+        """Every suggestion for this color pair, rendered"""
+        key = (top_color, bottom_color)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = self._render(top_color, bottom_color)
+            if len(self._rendered) < MAX_RENDERED_PAIRS:
+                self._rendered[key] = rendered
+        return rendered
+
+    def bad_combination_tips(self, bottom_type: str) -> Tuple[str, ...]:
+        """Extra advice for a poor match, keyed by the bottom type (e.g. jeans)"""
+        return self.bottom_tips.get(bottom_type, ())
+
+
+def load_color_rules(path: str = DEFAULT_RULES_PATH) -> ColorRules:
+    with open(path) as file:
+        return ColorRules(json.load(file))
@@ -0,0 +1,82 @@
+import hashlib
+import json
+from typing import Any, Callable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# orjson is several times faster than the json module; it is optional and
+# responses are the same either way
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    # Raises orjson.JSONDecodeError, a ValueError subclass like json's
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONResponse(Response):
+    """JSONResponse encoded with orjson when it is installed"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """A body that is already encoded JSON, sent as-is"""
+
+    media_type = "application/json"
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+class StaticJSON:
+    """
+    A JSON document encoded once, served with an ETag so clients can
+    revalidate with If-None-Match and get a bodyless 304. Pass a key
+    callable to re-encode when what the document depends on changes
+    (e.g. the model version).
+    """
+
+    def __init__(self, build: Callable[[], Any], key: Optional[Callable[[], Any]] = None,
+                 cache_control: str = "no-cache"):
+        self.build = build
+        self.key = key
+        self.cache_control = cache_control
+        self._encoded = None  # (key, body, etag)
+
+    def encoded(self):
+        key = self.key() if self.key is not None else None
+        encoded = self._encoded
+        if encoded is None or encoded[0] != key:
+            body = dumps(self.build())
+            encoded = self._encoded = (key, body, '"%s"' % hashlib.sha1(body).hexdigest()[:20])
+        return encoded
+
+    def response(self, request: Request) -> Response:
+        _, body, etag = self.encoded()
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return RawJSONResponse(body, headers=headers)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison: weak, comma-separated list, or '*'"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
@@ -0,0 +1,280 @@
+import numpy as np
+from typing import Dict
+
+# Arrays that make up an exported forest
+FOREST_ARRAYS = ['roots', 'feature', 'threshold', 'left', 'right', 'leaf_proba', 'classes', 'max_depth']
+
+
+def export_forest(model) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted sklearn RandomForestClassifier into plain numpy arrays.
+
+    Every tree's nodes are concatenated into one node table. Leaves point to
+    themselves on both sides, so a fixed number of traversal steps is enough
+    for every tree and no leaf check is needed while walking.
+    """
+    features, thresholds, lefts, rights, leaf_probas, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+        feature = np.where(is_leaf, 0, tree.feature)
+
+        # Same per-leaf probabilities as DecisionTreeClassifier.predict_proba.
+        # Older sklearn stores class counts and normalizes at predict time;
+        # newer versions already store fractions.
+        value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        totals = value.sum(axis=1)
+        if not np.allclose(totals, 1.0, rtol=0, atol=1e-9):
+            totals[totals == 0.0] = 1.0
+            value = value / totals[:, None]
+
+        roots.append(offset)
+        features.append(feature)
+        thresholds.append(tree.threshold)
+        lefts.append(left)
+        rights.append(right)
+        leaf_probas.append(value)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    return {
+        'roots': np.array(roots, dtype=np.int64),
+        'feature': np.concatenate(features).astype(np.int64),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int64),
+        'right': np.concatenate(rights).astype(np.int64),
+        'leaf_proba': np.concatenate(leaf_probas),
+        'classes': np.asarray(model.classes_),
+        'max_depth': np.array(max_depth, dtype=np.int64),
+    }
+
+
+def smallest_int_dtype(low: int, high: int) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def compact_forest(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Shrink exported forest arrays for integer-coded features, keeping every
+    prediction bit-for-bit.
+
+    - Thresholds are floored to integers: for an integer code x, x <= 2.5
+      is the same test as x <= 2.
+    - Leaves with the same probabilities become one shared node, and so do
+      identical subtrees, so duplicate trees end up sharing one root.
+    - A split whose two sides turned out identical is replaced by that side.
+    - Shared leaves are numbered first, so leaf_proba only has their rows.
+    - Every array gets the smallest integer type its values fit in.
+
+    The probabilities are kept as float64 and still summed in estimator
+    order, so predict_proba is unchanged.
+    """
+    feature, threshold = arrays['feature'], arrays['threshold']
+    left, right, leaf_proba = arrays['left'], arrays['right'], arrays['leaf_proba']
+    node_ids = np.arange(len(feature))
+    is_leaf = (left == node_ids) & (right == node_ids)
+    if np.issubdtype(threshold.dtype, np.floating):
+        threshold = np.floor(threshold)
+
+    leaf_values: Dict[bytes, int] = {}  # probability row -> shared leaf
+    splits: Dict[tuple, int] = {}  # (feature, threshold, left, right) -> shared split
+    # Old node -> shared node; leaves are ~k and splits k until renumbered below
+    merged: Dict[int, int] = {}
+
+    # Post-order walk from every root, so both subtrees are merged before the
+    # node above them; nodes no root reaches are dropped
+    for root in arrays['roots'].tolist():
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node in merged:
+                stack.pop()
+                continue
+            if is_leaf[node]:
+                row = np.ascontiguousarray(leaf_proba[node])
+                merged[node] = ~leaf_values.setdefault(row.tobytes(), len(leaf_values))
+                stack.pop()
+                continue
+            children = (int(left[node]), int(right[node]))
+            pending = [child for child in children if child not in merged]
+            if pending:
+                stack.extend(pending)
+                continue
+            low, high = merged[children[0]], merged[children[1]]
+            if low == high:
+                merged[node] = low
+            else:
+                key = (int(feature[node]), int(threshold[node]), low, high)
+                merged[node] = splits.setdefault(key, len(splits))
+            stack.pop()
+
+    n_leaves = len(leaf_values)
+    n_nodes = n_leaves + len(splits)
+
+    def renumber(ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        return np.where(ids < 0, ~ids, ids + n_leaves)
+
+    keys = np.array(list(splits), dtype=np.int64).reshape(-1, 4)
+    leaf_ids = np.arange(n_leaves)
+    new_feature = np.concatenate([np.zeros(n_leaves, dtype=np.int64), keys[:, 0]])
+    new_threshold = np.concatenate([np.zeros(n_leaves, dtype=np.int64), keys[:, 1]])
+    new_left = np.concatenate([leaf_ids, renumber(keys[:, 2])])
+    new_right = np.concatenate([leaf_ids, renumber(keys[:, 3])])
+    roots = renumber([merged[root] for root in arrays['roots'].tolist()])
+
+    # Splits were added children first, so one pass in that order finds depths
+    depth = np.zeros(n_nodes, dtype=np.int64)
+    for node in range(n_leaves, n_nodes):
+        depth[node] = 1 + max(depth[new_left[node]], depth[new_right[node]])
+
+    index_dtype = smallest_int_dtype(0, n_nodes - 1)
+    return {
+        'roots': roots.astype(index_dtype),
+        'feature': new_feature.astype(smallest_int_dtype(0, int(new_feature.max(initial=0)))),
+        'threshold': new_threshold.astype(smallest_int_dtype(int(new_threshold.min(initial=0)),
+                                                             int(new_threshold.max(initial=0)))),
+        'left': new_left.astype(index_dtype),
+        'right': new_right.astype(index_dtype),
+        'leaf_proba': np.frombuffer(b''.join(leaf_values), dtype=leaf_proba.dtype).reshape(n_leaves, -1),
+        'classes': arrays['classes'],
+        'max_depth': np.array(int(depth[roots].max(initial=0)), dtype=np.int64),
+    }
+
+
+class FlatForest:
+    """
+    Vectorized inference over an exported forest.
+
+    Exposes predict, predict_proba and classes_ so it can stand in for the
+    sklearn model in main.py. Results match sklearn exactly: inputs are
+    compared as float32 like sklearn's trees, and the per-tree probabilities
+    are summed in estimator order before dividing by the number of trees.
+    A compacted forest (integer thresholds) takes integer category codes.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._arrays = {name: arrays[name] for name in FOREST_ARRAYS}
+        # Used as given, without copies, so a memory-mapped artifact stays
+        # shared between workers (see index_arrays for the narrow types)
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.leaf_proba = arrays['leaf_proba']
+        self.classes_ = arrays['classes']
+        self.max_depth = int(arrays['max_depth'])
+        self.n_classes_ = len(self.classes_)
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'FlatForest':
+        return cls(export_forest(model))
+
+    def compact(self) -> 'FlatForest':
+        """The same forest in the smaller form built by compact_forest"""
+        return FlatForest(compact_forest(self.arrays()))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """The arrays the forest was built from, keyed by the names in FOREST_ARRAYS"""
+        return dict(self._arrays)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of those arrays, i.e. of the forest as saved in an artifact"""
+        return sum(array.nbytes for array in self._arrays.values())
+
+    def index_arrays(self, n_rows: int):
+        """
+        roots, feature, left and right for a traversal of n_rows rows.
+
+        numpy converts narrow index arrays (a compact forest's int8/int16) to
+        intp on every lookup, which costs more than one conversion up front
+        once the traversal does more lookups than the arrays have entries. So
+        for such batches they are widened for this call only; the stored,
+        shared arrays are never replaced by private copies.
+        """
+        arrays = (self.roots, self.feature, self.left, self.right)
+        if n_rows * self.n_estimators * self.max_depth < len(self.feature):
+            return arrays
+        return tuple(array.astype(np.intp, copy=False) for array in arrays)
+
+    def apply(self, X) -> np.ndarray:
+        """Global leaf index reached in every tree, shape (n_samples, n_trees)"""
+        if self.threshold.dtype.kind == 'f':
+            X = np.asarray(X, dtype=np.float32)
+        else:
+            # Floored thresholds give the same splits only for whole numbers
+            X = np.asarray(X)
+            if X.dtype.kind == 'f':
+                codes = X.astype(np.int64)
+                if not np.array_equal(codes, X):
+                    raise ValueError("Compact forest inputs must be integer category codes")
+                X = codes
+        if X.ndim == 1:
+            X = X[None, :]
+        roots, feature, left, right = self.index_arrays(len(X))
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(roots, (len(X), self.n_estimators))
+        for _ in range(self.max_depth):
+            go_left = X[rows, feature[node]] <= self.threshold[node]
+            node = np.where(go_left, left[node], right[node])
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        # Reducing over the leading (tree) axis adds trees one after another,
+        # the same order sklearn accumulates them in
+        proba = self.leaf_proba[leaves.T].sum(axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def verify_against(model, forest: FlatForest, X) -> bool:
+    """True if the flat forest reproduces the sklearn model's outputs exactly"""
+    X = np.asarray(X)
+    return (np.array_equal(model.predict_proba(X), forest.predict_proba(X))
+            and np.array_equal(model.predict(X), forest.predict(X)))
+
+
+if __name__ == "__main__":
+    import pickle
+
+    # Check the exported forest against the pickled model on every combination
+    # of the encoder vocabularies, plus each row one at a time for a sample
+    with open('clothing_combo_model.pkl', 'rb') as file:
+        model = pickle.load(file)
+    with open('encoders.pkl', 'rb') as file:
+        encoders = pickle.load(file)
+
+    from prediction_table import FEATURES
+    shape = tuple(len(encoders[feature].classes_) for feature in FEATURES)
+    grid = np.indices(shape).reshape(len(shape), -1).T
+    sample = grid[np.random.default_rng(0).choice(len(grid), size=min(200, len(grid)), replace=False)]
+
+    forest = FlatForest.from_sklearn(model)
+    compact = forest.compact()
+    all_ok = True
+    for name, candidate in (('Exported', forest), ('Compact', compact)):
+        batch_ok = verify_against(model, candidate, grid)
+        single_ok = all(verify_against(model, candidate, row[None, :]) for row in sample)
+        all_ok = all_ok and batch_ok and single_ok
+        print(f"{name} forest: {len(candidate.feature)} nodes, {candidate.nbytes} bytes, depth {candidate.max_depth}")
+        print(f"  Batch of {len(grid)} rows: {'match' if batch_ok else 'MISMATCH'}")
+        print(f"  {len(sample)} single rows: {'match' if single_ok else 'MISMATCH'}")
+    raise SystemExit(0 if all_ok else 1)
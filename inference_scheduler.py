@@ -0,0 +1,109 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class InferenceScheduler:
+    """
+    Collects concurrent inference calls into micro-batches.
+
+    Rows submitted from the event loop are queued until either max_batch_size
+    rows are waiting or max_wait_us microseconds have passed since the first
+    one arrived. The batch is then scored with a single predict_batch call on
+    a worker thread, and every caller's future is resolved with its own row.
+    Rows are submitted with the model to score them with, and rows for
+    different models (e.g. across a hot reload) are never batched together.
+    """
+
+    def __init__(self, predict_batch: Callable[[Any, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+                 max_batch_size: int = 32, max_wait_us: int = 500, pool_size: int = 1):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_us = max(0, max_wait_us)
+        self.pool_size = max(1, pool_size)
+        self._executor = None
+        self._pending: List[Tuple[Any, Sequence[int], asyncio.Future]] = []
+        self._flush_handle = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so the scheduler can be restarted after shutdown()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size,
+                                                thread_name_prefix="inference")
+        return self._executor
+
+    async def submit(self, model: Any, row: Sequence[int]) -> Tuple[int, float]:
+        """Queue one encoded row and wait for its (prediction, confidence)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((model, row, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_us / 1_000_000, self._flush)
+
+        return await future
+
+    async def submit_many(self, model: Any, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Score an already-batched array of rows with one call on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.predict_batch, model, np.asarray(X))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # One predict_batch call per model, normally just one
+        by_model: Dict[int, Tuple[Any, list]] = {}
+        for model, row, future in batch:
+            by_model.setdefault(id(model), (model, []))[1].append((row, future))
+
+        loop = asyncio.get_running_loop()
+        for model, rows in by_model.values():
+            X = np.array([row for row, _ in rows])
+            task = loop.run_in_executor(self._get_executor(), self.predict_batch, model, X)
+            task.add_done_callback(lambda done, rows=rows: self._resolve(rows, done))
+
+    @staticmethod
+    def _resolve(batch, done: asyncio.Future):
+        if done.cancelled():
+            # e.g. the loop is being torn down; don't leave the callers waiting
+            for _, future in batch:
+                future.cancel()
+            return
+        error = done.exception()
+        if error is None:
+            predictions, confidences = done.result()
+
+        for i, (_, future) in enumerate(batch):
+            if future.done():  # Caller went away
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result((int(predictions[i]), float(confidences[i])))
+
+    def shutdown(self):
+        """Score the rows still waiting for a batch, wait for running batches and stop the worker pool"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Their event loop has stopped, so nobody is awaiting them
+                self._pending = []
+            else:
+                self._flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
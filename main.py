@@ -1,14 +1,80 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import pickle
-import pandas as pd
-from typing import Dict, Any, List, Optional
+import asyncio
+import numpy as np
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple
 import uvicorn
 import os
-import json
+import sys
+import csv
+import secrets
+from prediction_table import FEATURES
+from inference_scheduler import InferenceScheduler
+from alternatives_index import AlternativesIndex
+from color_rules import DEFAULT_RULES_PATH, load_color_rules
+from response_cache import ResponseCache, outfit_cache_key
+from model_artifact import DEFAULT_ARTIFACT_DIR
+from model_holder import ModelHolder, ModelVersion, load_model_version, source_signature, validate_model_version
+from metrics import Metrics, MetricsMiddleware, CONTENT_TYPE, cache_collector
+from fast_json import FastJSONResponse, RawJSONResponse, StaticJSON, dumps, loads
+from ndjson_records import merge_results, parse_ndjson_line, split_records
+from mcp_protocol import MCPServer, PARSE_ERROR, is_request, rpc_error
+from profiling import ProfileStore, ProfilingMiddleware
+from tracing import TracingMiddleware, collector, exporter_from_env
+from request_log import AccessLogMiddleware, RequestLog, annotate, log_error, logging_settings
+from server import load_config
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global request_log, warming_up
+    # Started here rather than at import so the writer thread exists in
+    # every forked worker; each worker gets its own file
+    request_log = RequestLog(logging_settings(load_config()), worker_id=os.environ.get("MCP_WORKER_ID"))
+    request_log.start()
+    warmer = None
+    if WARMUP:
+        # Warm up on a thread once startup is done, so the worker already
+        # accepts connections and /health answers 503 until it finishes
+        warming_up = True
+        warmer = asyncio.create_task(asyncio.to_thread(warmup))
+    watcher = asyncio.create_task(model_holder.watch(MODEL_WATCH_INTERVAL)) if MODEL_WATCH_INTERVAL > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    if warmer is not None:
+        await warmer
+    # Let queued batches finish before the worker pool goes away
+    inference_scheduler.shutdown()
+    request_log.stop()
+    request_log = None
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-stage and per-endpoint timings, served on /metrics
+metrics = Metrics("advisor")
+app.add_middleware(MetricsMiddleware, metrics=metrics, paths=lambda: [route.path for route in app.routes])
+
+# Structured access and error log from mcp_config.json's logging section,
+# written by a background thread (see request_log.py)
+request_log: Optional[RequestLog] = None
+app.add_middleware(AccessLogMiddleware, sample_rate=lambda: request_log.sample_rate if request_log else 0.0)
+metrics.add_collector(lambda: [
+    ("log_records_dropped_total", "counter", "Log records dropped because the writer fell behind",
+     request_log.handler.dropped if request_log else 0),
+    ("log_queue_size", "gauge", "Log records waiting to be written", request_log.queue.qsize() if request_log else 0),
+])
+
+# Distributed tracing, off unless TRACING=memory or file: a span per request
+# (joining the caller's trace from its traceparent header) with a child for
+# every metrics stage. Bee forwards its trace context on calls to /mcp.
+TRACE_SERVICE = "clothing-advisor"
+trace_exporter = exporter_from_env()
+if trace_exporter is not None:
+    app.add_middleware(TracingMiddleware, service=TRACE_SERVICE, exporter=trace_exporter,
+                       sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 1.0)))
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,12 +85,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model and encoders
-with open('clothing_combo_model.pkl', 'rb') as file:
-    model = pickle.load(file)
+# Good combinations kept in memory for alternative suggestions
+alternatives_index = AlternativesIndex('clothing_combinations.csv')
+
+# Style rules from color_rules.json, compiled to hash lookups per color pair
+color_rules = load_color_rules(os.environ.get("COLOR_RULES_PATH", DEFAULT_RULES_PATH))
+
+# Load model and encoders (the artifact from train_model.py, or the pickles)
+# behind a holder that can swap in a retrained model without a restart.
+# Request handlers read model_holder.current once and use it throughout.
+MODEL_ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR)
+
+def probe_outfits(limit: int = 256) -> List[Dict[str, str]]:
+    """Known outfits from the training CSV, scored to validate a new model version"""
+    try:
+        with open('clothing_combinations.csv', newline='') as file:
+            return [row for _, row in zip(range(limit), csv.DictReader(file))]
+    except FileNotFoundError:
+        return []
+
+model_holder = ModelHolder(
+    lambda: load_model_version(MODEL_ARTIFACT_DIR),
+    lambda: source_signature(MODEL_ARTIFACT_DIR),
+    # Score a sample of known outfits with each new version before it goes live
+    validate=lambda candidate: validate_model_version(candidate, probe_outfits()),
+)
+
+# Seconds between checks for a retrained model on disk (0 disables the watch)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+
+# Token required by the /admin endpoints, /traces and the X-Profile header,
+# sent as X-Admin-Token. Unset means they are all refused
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+def is_admin_token(token: Optional[bytes]) -> bool:
+    """True only if ADMIN_TOKEN is set and token matches it (in constant time)"""
+    return bool(ADMIN_TOKEN) and token is not None and secrets.compare_digest(token, ADMIN_TOKEN.encode())
 
-with open('encoders.pkl', 'rb') as file:
-    encoders = pickle.load(file)
+# Opt-in cProfile of single requests, sent 'X-Profile: 1' with the admin
+# token or sampled at PROFILE_SAMPLE_RATE. Profiles are kept in memory and
+# served on /admin/profiles. With PROFILING off the middleware isn't
+# installed, so requests don't pay for it.
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+profile_store = ProfileStore(int(os.environ.get("PROFILE_CAPACITY", 50)))
+if PROFILING:
+    app.add_middleware(
+        ProfilingMiddleware, store=profile_store,
+        sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0)),
+        allow_header=lambda headers: is_admin_token(headers.get(b"x-admin-token")),
+    )
+
+# Rank alternatives by model confidence instead of taking the first good row
+# (needs the prediction table; see alternative_scorer)
+RANK_ALTERNATIVES = os.environ.get("RANK_ALTERNATIVES", "0") == "1"
+
+# Files whose changes make cached responses stale. Model changes don't need
+# to be listed: cache keys include the model version, and a reload clears it
+ARTIFACT_FILES = ['clothing_combinations.csv']
+
+def artifact_version():
+    """mtime and size of each artifact, used to invalidate the response cache"""
+    version = []
+    for path in ARTIFACT_FILES:
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append((path, None, None))
+    return tuple(version)
+
+# Responses for repeated outfits, shared by /mcp and the predict endpoint
+response_cache = ResponseCache(
+    max_size=int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 300)),
+    version=artifact_version,
+)
+metrics.add_collector(cache_collector(response_cache))
+model_holder.listeners.append(lambda previous, current: response_cache.clear())
+
+# Encoded response bodies for single-outfit requests, per endpoint, so a
+# repeated outfit skips building and serializing its response entirely
+body_cache = ResponseCache(
+    max_size=int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 300)),
+    version=artifact_version,
+)
+model_holder.listeners.append(lambda previous, current: body_cache.clear())
+metrics.add_collector(lambda: [
+    ("model_reloads_total", "counter", "Model versions swapped in since start", model_holder.reloads),
+    ("model_reload_failures_total", "counter", "Reloads rejected by loading or validation", model_holder.reload_failures),
+])
+
+# Run representative outfits through the service before taking traffic
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+warming_up = False
+
+# Live model calls are micro-batched on a worker pool, off the event loop
+inference_scheduler = InferenceScheduler(
+    lambda model, X: predict_batch(model, X),
+    max_batch_size=int(os.environ.get("INFERENCE_BATCH_SIZE", 32)),
+    max_wait_us=int(os.environ.get("INFERENCE_BATCH_WAIT_US", 500)),
+    pool_size=int(os.environ.get("INFERENCE_POOL_SIZE", 1)),
+)
 
 class ClothingInput(BaseModel):
     top_type: str
@@ -41,138 +203,416 @@ class MCPResponse(BaseModel):
 
 # New class for MCP Inspector compatibility
 class MCPInspectorRequest(BaseModel):
-    inputs: Dict[str, Any]
+    inputs: Optional[Dict[str, Any]] = None
+    instances: Optional[List[Dict[str, Any]]] = None
     config: Optional[Dict[str, Any]] = None
 
 def get_color_compatibility_rules(top_color: str, bottom_color: str) -> List[str]:
     """Generate style rules based on color combinations"""
-    neutral_colors = ['black', 'white', 'gray', 'beige', 'khaki', 'navy', 'brown']
-    
-    suggestions = []
-    
-    # Basic rules
-    if top_color == bottom_color:
-        suggestions.append("Wearing the same color for top and bottom can look monochromatic. Consider adding a contrasting accessory.")
-    
-    # Color wheel opposites generally work well
-    good_pairs = [
-        {'blue', 'orange'}, {'red', 'green'}, {'yellow', 'purple'},
-        {'black', 'white'}, {'navy', 'khaki'}, {'burgundy', 'blue'}
-    ]
-    
-    # Some challenging combinations
-    difficult_pairs = [
-        {'red', 'pink'}, {'orange', 'red'}, {'brown', 'black'},
-        {'neon_green', 'neon_pink'}, {'purple', 'green'}, {'yellow', 'red'}
-    ]
-    
-    current_pair = {top_color, bottom_color}
-    
-    for pair in good_pairs:
-        if current_pair == pair:
-            suggestions.append(f"The {top_color} and {bottom_color} combination is complementary and works well.")
-    
-    for pair in difficult_pairs:
-        if current_pair == pair:
-            suggestions.append(f"The {top_color} and {bottom_color} combination can be challenging. Consider replacing one with a neutral.")
-    
-    if top_color in neutral_colors and bottom_color in neutral_colors:
-        suggestions.append("Your outfit is neutral and versatile but might benefit from a pop of color with accessories.")
-    
-    if not suggestions:  # If no specific rules matched
-        suggestions.append(f"Consider whether {top_color} and {bottom_color} complement each other based on the color wheel.")
-    
-    return suggestions
+    return list(color_rules.suggestions(top_color, bottom_color))
 
 @app.post("/mcp", response_model=MCPResponse)
 async def mcp_endpoint(request: MCPRequest):
     """
-    Main MCP endpoint that processes requests
+    Main MCP endpoint that processes requests. X-Model-Version names the
+    model that answered, so clients caching responses (Bee) can tell when
+    a reload makes them stale.
     """
+    active = model_holder.current
+    headers = {"X-Model-Version": active.version}
     if request.action == "evaluate_outfit":
-        return {"response": evaluate_outfit(request.action_input)}
-    else:
+        return RawJSONResponse(await outfit_body("mcp", request.action_input, lambda result: {"response": result},
+                                                 active), headers=headers)
+    try:
+        return FastJSONResponse({"response": await run_action(request.action, request.action_input)},
+                                headers=headers)
+    except KeyError:
         raise HTTPException(status_code=400, detail=f"Unsupported action: {request.action}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def run_action(action: str, action_input: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one action for /mcp and MCP tools/call. Raises KeyError for an
+    unknown action and ValueError for input it can't use.
+    """
+    if action == "evaluate_outfit":
+        return await evaluate_outfit_async(action_input)
+    elif action == "evaluate_outfits":
+        outfits = action_input.get("outfits")
+        if not isinstance(outfits, list):
+            raise ValueError("evaluate_outfits expects a list of outfits in 'outfits'")
+        return {"results": await evaluate_outfits_async(outfits)}
+    elif action in RECOMMEND_ACTIONS:
+        try:
+            k = int(action_input.get("k", DEFAULT_RECOMMENDATIONS))
+            min_score = float(action_input.get("min_score", DEFAULT_MIN_SCORE))
+        except (TypeError, ValueError):
+            raise ValueError("'k' must be an integer and 'min_score' a number")
+        if not np.isfinite(min_score):
+            raise ValueError("'min_score' must be a finite number")
+        return await recommend_async(action, action_input, k, min_score)
+    raise KeyError(action)
+
+def unknown_item_response() -> Dict[str, Any]:
+    return {
+        "is_good_combination": False,
+        "confidence": 0.0,
+        "suggestions": ["One or more of your clothing items or colors are not in my database. Please check your spelling or try different options."],
+        "message": "Unknown clothing item or color"
+    }
+
+def error_response(e: Exception) -> Dict[str, Any]:
+    metrics.count_error("evaluate_outfit")
+    log_error("evaluate_outfit failed", e)
+    return {
+        "is_good_combination": False,
+        "confidence": 0.0,
+        "suggestions": ["An error occurred while processing your request."],
+        "message": f"Error: {str(e)}"
+    }
+
+def encode_outfit(input_data: Dict[str, Any], active: ModelVersion) -> Optional[List[int]]:
+    """Encode the four outfit fields, or return None if any of them is unknown"""
+    return active.vocab_encoder.encode(input_data)
+
+def predict_batch(model, X) -> Tuple[np.ndarray, np.ndarray]:
+    """Score a batch of encoded rows with one predict_proba call"""
+    proba = model.predict_proba(X)
+    predictions = model.classes_[np.argmax(proba, axis=1)]
+    return predictions, proba[:, 1]  # Probability of good combination
+
+def alternative_scorer(top_type: str, top_color: str, active: ModelVersion):
+    """
+    Score candidate (bottom_type, bottom_color) pairs against this top from
+    the prediction table. None without a table: responses are built on the
+    event loop, where running the forest would block every other request,
+    so the first good row is used instead.
+    """
+    if active.prediction_table is None:
+        return None
+
+    def score(candidates):
+        outfits = [
+            {"top_type": top_type, "top_color": top_color, "bottom_type": bottom_type, "bottom_color": bottom_color}
+            for bottom_type, bottom_color in candidates
+        ]
+        X, valid = encode_outfits(outfits, active)
+        confidences = np.full(len(outfits), -1.0)
+        if valid.any():
+            confidences[valid] = active.prediction_table.lookup_many(X[valid])[1]
+        return confidences
+    return score
+
+def build_outfit_response(input_data: Dict[str, Any], prediction: int, confidence: float,
+                          active: Optional[ModelVersion] = None) -> Dict[str, Any]:
+    """Turn a model prediction into the response with suggestions"""
+    top_type = input_data.get('top_type', '')
+    top_color = input_data.get('top_color', '')
+    bottom_type = input_data.get('bottom_type', '')
+    bottom_color = input_data.get('bottom_color', '')
+
+    # Generate suggestions based on prediction
+    suggestions = []
+
+    if prediction == 1:
+        message = "This is a good outfit combination!"
+        suggestions.append("Your combination looks great!")
+
+        # Add style tips even for good combinations
+        with metrics.stage("color_rules"):
+            suggestions.extend(color_rules.suggestions(top_color, bottom_color))
+
+    else:
+        message = "This combination could be improved."
+
+        # Suggest alternatives based on what works well with the top
+        with metrics.stage("alternatives"):
+            score = alternative_scorer(top_type, top_color, active or model_holder.current) if RANK_ALTERNATIVES else None
+            alternative = alternatives_index.best_alternative(top_type, top_color, score)
+
+        if alternative is not None:
+            alternative_type, alternative_color = alternative
+            suggestions.append(f"Consider pairing your {top_color} {top_type} with {alternative_color} {alternative_type} instead.")
+
+        # Add general rules for the combination
+        with metrics.stage("color_rules"):
+            suggestions.extend(color_rules.suggestions(top_color, bottom_color))
+
+            # Add general advice for the bottom (e.g. jeans)
+            suggestions.extend(color_rules.bad_combination_tips(bottom_type))
+
+    return {
+        "is_good_combination": bool(prediction),
+        "confidence": float(confidence),
+        "suggestions": suggestions,
+        "message": message
+    }
+
+def run_inline(coroutine):
+    """
+    Result of a coroutine that never suspends, run without an event loop.
+    The sync entry points use it with a predict step that calls the model
+    directly, so they share the async scoring code.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError("Coroutine suspended outside an event loop")
+
+async def predict_inline(model, X) -> Tuple[np.ndarray, np.ndarray]:
+    return predict_batch(model, X)
+
+async def predict_row_inline(model, row: List[int]) -> Tuple[int, float]:
+    predictions, confidences = predict_batch(model, [row])
+    return predictions[0], confidences[0]
+
+async def score_outfit_with(input_data: Dict[str, Any], active: ModelVersion, predict_row) -> Dict[str, Any]:
+    """
+    Encode one outfit, look it up in the prediction table (or await
+    predict_row(model, row) if there is none) and build the response
+    """
+    with metrics.stage("encode"):
+        X = encode_outfit(input_data, active)
+    if X is None:
+        return unknown_item_response()
+
+    # A table lookup is cheaper than a trip to the worker pool
+    if active.prediction_table is not None:
+        with metrics.stage("table_lookup"):
+            prediction, confidence = active.prediction_table.lookup(X)
+    else:
+        with metrics.stage("predict"):
+            prediction, confidence = await predict_row(active.model, X)
+
+    with metrics.stage("suggestions"):
+        return build_outfit_response(input_data, prediction, confidence, active)
+
+def score_outfit(input_data: Dict[str, Any], active: Optional[ModelVersion] = None) -> Dict[str, Any]:
+    return run_inline(score_outfit_with(input_data, active or model_holder.current, predict_row_inline))
+
+async def score_outfit_async(input_data: Dict[str, Any], active: ModelVersion) -> Dict[str, Any]:
+    return await score_outfit_with(input_data, active, inference_scheduler.submit)
 
 def evaluate_outfit(input_data: Dict[str, Any]) -> Dict[str, Any]:
     try:
-        # Extract clothing details
-        top_type = input_data.get('top_type', '')
-        top_color = input_data.get('top_color', '')
-        bottom_type = input_data.get('bottom_type', '')
-        bottom_color = input_data.get('bottom_color', '')
-        
-        # Encode inputs
-        encoded_top_type = encoders['top_type'].transform([top_type])[0] if top_type in encoders['top_type'].classes_ else -1
-        encoded_top_color = encoders['top_color'].transform([top_color])[0] if top_color in encoders['top_color'].classes_ else -1
-        encoded_bottom_type = encoders['bottom_type'].transform([bottom_type])[0] if bottom_type in encoders['bottom_type'].classes_ else -1
-        encoded_bottom_color = encoders['bottom_color'].transform([bottom_color])[0] if bottom_color in encoders['bottom_color'].classes_ else -1
-        
-        # Check if any encoding failed
-        if -1 in [encoded_top_type, encoded_top_color, encoded_bottom_type, encoded_bottom_color]:
-            return {
-                "is_good_combination": False,
-                "confidence": 0.0,
-                "suggestions": ["One or more of your clothing items or colors are not in my database. Please check your spelling or try different options."],
-                "message": "Unknown clothing item or color"
-            }
-        
-        # Predict with model
-        X = [[encoded_top_type, encoded_top_color, encoded_bottom_type, encoded_bottom_color]]
-        prediction = model.predict(X)[0]
-        confidence = model.predict_proba(X)[0][1]  # Probability of good combination
-        
-        # Generate suggestions based on prediction
-        suggestions = []
-        
-        if prediction == 1:
-            message = "This is a good outfit combination!"
-            suggestions.append("Your combination looks great!")
-            
-            # Add style tips even for good combinations
-            color_rules = get_color_compatibility_rules(top_color, bottom_color)
-            suggestions.extend(color_rules)
-            
-        else:
-            message = "This combination could be improved."
-            
-            # Suggest alternatives based on what works well with the top
-            similar_tops_df = pd.read_csv('clothing_combinations.csv')
-            similar_tops = similar_tops_df[(similar_tops_df['top_type'] == top_type) & 
-                                          (similar_tops_df['good_combination'] == 1)]
-            
-            if not similar_tops.empty:
-                alternative = similar_tops.iloc[0]
-                suggestions.append(f"Consider pairing your {top_color} {top_type} with {alternative['bottom_color']} {alternative['bottom_type']} instead.")
-            
-            # Add general rules for the combination
-            color_rules = get_color_compatibility_rules(top_color, bottom_color)
-            suggestions.extend(color_rules)
-            
-            # Add general advice
-            if bottom_type == "jeans":
-                suggestions.append("Jeans are versatile - try a different colored top to create a better match.")
-            
-        return {
-            "is_good_combination": bool(prediction),
-            "confidence": float(confidence),
-            "suggestions": suggestions,
-            "message": message
-        }
-        
+        # Pin the model version for the whole request, across hot reloads
+        active = model_holder.current
+        key = outfit_cache_key(input_data)
+        if key is None:
+            return score_outfit(input_data, active)
+
+        key = (active.version,) + key
+        result = response_cache.get(key)
+        if result is None:
+            result = score_outfit(input_data, active)
+            response_cache.put(key, result)
+        return result
+
     except Exception as e:
-        return {
-            "is_good_combination": False,
-            "confidence": 0.0,
-            "suggestions": ["An error occurred while processing your request."],
-            "message": f"Error: {str(e)}"
-        }
+        return error_response(e)
 
-@app.get("/actions")
-async def get_actions():
+async def evaluate_outfit_async(input_data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Endpoint for MCP Inspector to discover available actions
+    Same as evaluate_outfit, but live model calls go through the inference
+    scheduler so the forest never runs on the event loop, and concurrent
+    misses for the same outfit share one computation
+    """
+    try:
+        active = model_holder.current
+        key = outfit_cache_key(input_data)
+        annotate(outfit=key, model_version=active.version)
+        if key is None:
+            return await score_outfit_async(input_data, active)
+        return await response_cache.get_or_compute((active.version,) + key,
+                                                   lambda: score_outfit_async(input_data, active))
+
+    except Exception as e:
+        return error_response(e)
+
+async def outfit_body(endpoint: str, input_data: Dict[str, Any], wrap,
+                      active: Optional[ModelVersion] = None) -> bytes:
+    """
+    The encoded response body for one outfit: evaluate_outfit_async's result
+    passed through wrap (the endpoint's envelope) and serialized. Bodies are
+    cached per endpoint and model version; error bodies never are.
     """
+    active = active or model_holder.current
+    key = outfit_cache_key(input_data)
+    annotate(outfit=key, model_version=active.version)
+    if key is None:
+        return dumps(wrap(await evaluate_outfit_async(input_data)))
+
+    async def compute():
+        result = await response_cache.get_or_compute((active.version,) + key,
+                                                     lambda: score_outfit_async(input_data, active))
+        return dumps(wrap(result))
+
+    try:
+        return await body_cache.get_or_compute((endpoint, active.version) + key, compute)
+    except Exception as e:
+        return dumps(wrap(error_response(e)))
+
+def encode_outfits(outfits: List[Any], active: ModelVersion) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode many outfits at once. Returns an (n, 4) array of codes and a mask
+    of the rows where every field was found in the vocabulary.
+    """
+    return active.vocab_encoder.encode_many(outfits)
+
+def build_outfit_responses(outfits: List[Any], valid: np.ndarray, predictions: np.ndarray,
+                           confidences: np.ndarray, active: ModelVersion) -> List[Dict[str, Any]]:
+    """Build one result per outfit; predictions are only given for the valid rows"""
+    results = []
+    scored = iter(zip(predictions, confidences))
+    for outfit, is_valid in zip(outfits, valid):
+        if not isinstance(outfit, dict):
+            results.append(error_response(ValueError("outfit must be an object")))
+            continue
+        if not is_valid:
+            results.append(unknown_item_response())
+            continue
+        prediction, confidence = next(scored)
+        try:
+            results.append(build_outfit_response(outfit, int(prediction), float(confidence), active))
+        except Exception as e:
+            results.append(error_response(e))
+    return results
+
+async def score_outfits_with(outfits: List[Any], active: ModelVersion, predict) -> List[Dict[str, Any]]:
+    """
+    Evaluate many outfits with one vectorized encode and one table lookup, or
+    one awaited predict(model, X) call if there is no table
+    """
+    with metrics.stage("encode_batch"):
+        X, valid = encode_outfits(outfits, active)
+    X = X[valid]
+    if len(X) == 0:
+        predictions, confidences = np.empty(0), np.empty(0)
+    elif active.prediction_table is not None:
+        with metrics.stage("table_lookup_batch"):
+            predictions, confidences = active.prediction_table.lookup_many(X)
+    else:
+        with metrics.stage("predict_batch"):
+            predictions, confidences = await predict(active.model, X)
+    with metrics.stage("suggestions_batch"):
+        return build_outfit_responses(outfits, valid, predictions, confidences, active)
+
+def evaluate_outfits(outfits: List[Any]) -> List[Dict[str, Any]]:
+    return run_inline(score_outfits_with(outfits, model_holder.current, predict_inline))
+
+async def evaluate_outfits_async(outfits: List[Any]) -> List[Dict[str, Any]]:
+    """Same as evaluate_outfits, with the live model call on the worker pool"""
+    active = model_holder.current
+    annotate(outfits=len(outfits), model_version=active.version)
+    return await score_outfits_with(outfits, active, inference_scheduler.submit_many)
+
+# Action -> (fields the caller gives, fields we recommend)
+RECOMMEND_ACTIONS = {
+    "recommend_bottoms": (("top_type", "top_color"), ("bottom_type", "bottom_color")),
+    "recommend_tops": (("bottom_type", "bottom_color"), ("top_type", "top_color")),
+}
+DEFAULT_RECOMMENDATIONS = 5
+MAX_RECOMMENDATIONS = 100
+DEFAULT_MIN_SCORE = 0.5
+
+def top_k(confidences: np.ndarray, k: int, min_score: float) -> np.ndarray:
+    """Flat indices of the k highest confidences at or above min_score, best first"""
+    candidates = np.flatnonzero(confidences >= min_score)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-confidences[candidates], k - 1)[:k]]
+    # Highest confidence first, ties in vocabulary order
+    return candidates[np.lexsort((candidates, -confidences[candidates]))]
+
+async def recommend_async(action: str, input_data: Dict[str, Any], k: int, min_score: float) -> Dict[str, Any]:
+    """
+    Score every counterpart in the vocabularies for a partial outfit and
+    return the top k. The caller may also fix one of the recommended fields
+    (e.g. bottom_type) to only rank the other, or both to score one outfit.
+    """
+    given, wanted = RECOMMEND_ACTIONS[action]
+    k = max(1, min(k, MAX_RECOMMENDATIONS))
+    # Confidences lie in [0, 1]; clamping also keeps the cache key bounded
+    min_score = max(0.0, min(min_score, 1.0))
+    active = model_holder.current
+    vocabularies = active.vocabularies
+    annotate(action=action, model_version=active.version)
+
+    codes: List[Optional[int]] = []
+    for j, feature in enumerate(FEATURES):
+        value = input_data.get(feature)
+        if feature in given or value is not None:
+            code = active.vocab_encoder.vocabularies[j].get(value) if isinstance(value, str) else None
+            if code is None:
+                return {
+                    "recommendations": [],
+                    "message": f"Unknown or missing {feature}" if feature in given else f"Unknown {feature}"
+                }
+            codes.append(code)
+        else:
+            codes.append(None)
+
+    free = [j for j, code in enumerate(codes) if code is None]
+    key = (active.version, action, tuple(codes), k, min_score)
+
+    async def compute():
+        if active.prediction_table is not None:
+            # Scores for every counterpart are already in the table
+            with metrics.stage("recommend_lookup"):
+                confidences = active.prediction_table.confidence_slice(codes).ravel()
+        else:
+            with metrics.stage("recommend_predict"):
+                shape = tuple(len(vocabularies[FEATURES[j]]) for j in free)
+                X = np.empty((int(np.prod(shape)), len(FEATURES)), dtype=np.int64)
+                for j, code in enumerate(codes):
+                    if code is not None:
+                        X[:, j] = code
+                if free:
+                    X[:, free] = np.indices(shape).reshape(len(free), -1).T
+                confidences = (await inference_scheduler.submit_many(active.model, X))[1]
+
+        best = top_k(np.asarray(confidences), k, min_score)
+        shape = tuple(len(vocabularies[FEATURES[j]]) for j in free)
+        recommendations = []
+        for flat_index in best:
+            recommendation = {FEATURES[j]: input_data[FEATURES[j]] for j in range(len(FEATURES))
+                              if FEATURES[j] in wanted and codes[j] is not None}
+            for j, code in zip(free, np.unravel_index(flat_index, shape)):
+                recommendation[FEATURES[j]] = vocabularies[FEATURES[j]][code]
+            recommendation["confidence"] = float(confidences[flat_index])
+            recommendations.append(recommendation)
+
+        if recommendations:
+            message = f"Found {len(recommendations)} recommendation(s)"
+        else:
+            message = f"Nothing scores at least {min_score}"
+        return {"recommendations": recommendations, "message": message}
+
+    return await response_cache.get_or_compute(key, compute)
+
+def warmup():
+    """
+    Evaluate every outfit in the training CSV once, so the model pages,
+    prediction table, alternatives index and response cache are warm
+    before the first real request. A failure is logged and the service
+    carries on cold.
+    """
+    global warming_up
+    warming_up = True
+    try:
+        with open('clothing_combinations.csv', newline='') as file:
+            outfits = list(csv.DictReader(file))
+        evaluate_outfits(outfits)
+        for outfit in outfits:
+            evaluate_outfit(outfit)
+    except Exception as e:
+        log_error("warmup failed", e)
+    finally:
+        warming_up = False
+
+def actions_document() -> Dict[str, Any]:
     return {
         "actions": [
             {
@@ -200,10 +640,128 @@ async def get_actions():
                     },
                     "required": ["top_type", "top_color", "bottom_type", "bottom_color"]
                 }
+            },
+            {
+                "name": "evaluate_outfits",
+                "description": "Evaluates many clothing combinations in one request",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "outfits": {
+                            "type": "array",
+                            "description": "Outfits with the same fields as evaluate_outfit",
+                            "items": {"type": "object"}
+                        }
+                    },
+                    "required": ["outfits"]
+                }
+            },
+            {
+                "name": "recommend_bottoms",
+                "description": "Ranks every bottom in the catalog against a top and returns the best matches",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "top_type": {"type": "string", "description": "Type of top wear"},
+                        "top_color": {"type": "string", "description": "Color of the top wear"},
+                        "bottom_type": {"type": "string", "description": "Optional: only rank colors of this bottom"},
+                        "bottom_color": {"type": "string", "description": "Optional: only rank bottoms in this color"},
+                        "k": {"type": "integer", "description": "Number of results (default 5, max 100)"},
+                        "min_score": {"type": "number", "description": "Minimum confidence (default 0.5)"}
+                    },
+                    "required": ["top_type", "top_color"]
+                }
+            },
+            {
+                "name": "recommend_tops",
+                "description": "Ranks every top in the catalog against a bottom and returns the best matches",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "bottom_type": {"type": "string", "description": "Type of bottom wear"},
+                        "bottom_color": {"type": "string", "description": "Color of the bottom wear"},
+                        "top_type": {"type": "string", "description": "Optional: only rank colors of this top"},
+                        "top_color": {"type": "string", "description": "Optional: only rank tops in this color"},
+                        "k": {"type": "integer", "description": "Number of results (default 5, max 100)"},
+                        "min_score": {"type": "number", "description": "Minimum confidence (default 0.5)"}
+                    },
+                    "required": ["bottom_type", "bottom_color"]
+                }
             }
         ]
     }
 
+# Discovery documents, encoded once and revalidated by ETag
+actions_json = StaticJSON(actions_document)
+
+@app.get("/actions")
+async def get_actions(request: Request):
+    """
+    Endpoint for MCP Inspector to discover available actions
+    """
+    return actions_json.response(request)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Response cache hit, miss and eviction counters"""
+    return {**response_cache.stats(), "encoded_bodies": body_cache.stats()}
+
+def check_admin_token(x_admin_token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: ADMIN_TOKEN is not set")
+    # Header values are decoded as latin-1, so this recovers the bytes sent
+    if not is_admin_token(x_admin_token.encode("latin-1") if x_admin_token is not None else None):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/admin/reload")
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    """
+    Load, validate and swap in the model on disk now. Requests already
+    running finish on the old version.
+    """
+    check_admin_token(x_admin_token)
+    reloaded = await model_holder.reload_async()
+    info = model_holder.info()
+    if not reloaded:
+        return JSONResponse(status_code=500, content={"reloaded": False, **info})
+    return {"reloaded": True, **info}
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Stored request profiles, newest first"""
+    check_admin_token(x_admin_token)
+    return {"enabled": PROFILING, "profiles": profile_store.list()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: int, sort: str = "cumulative", limit: int = 40, format: str = "text",
+                      x_admin_token: Optional[str] = Header(None)):
+    """
+    One profile as a pstats report (sort by any pstats key), or with
+    format=prof as a file for snakeviz and pstats.Stats
+    """
+    check_admin_token(x_admin_token)
+    entry = profile_store.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No profile {profile_id}")
+    if format == "prof":
+        return Response(entry["stats"], media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="request-{profile_id}.prof"'})
+    try:
+        return PlainTextResponse(ProfileStore.report(entry, sort, limit))
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+
+@app.get("/traces")
+async def get_traces(trace_id: Optional[str] = None, limit: int = 50, x_admin_token: Optional[str] = Header(None)):
+    """Recent traces from the in-memory collector (TRACING=memory), newest first"""
+    check_admin_token(x_admin_token)
+    return {"enabled": trace_exporter is not None, "traces": collector().find(trace_id, limit)}
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of stage timings, request counts and cache stats"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
 @app.get("/status")
 async def status():
     """
@@ -221,14 +779,21 @@ def read_root():
 @app.get("/health")
 def health_check():
     """Health check endpoint required by MCP Inspector"""
+    if warming_up:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
     return {"status": "healthy"}
 
 @app.get("/metadata")
-def get_metadata():
+def get_metadata(request: Request):
     """Metadata endpoint required by MCP Inspector"""
+    return metadata_json.response(request)
+
+def metadata_document() -> Dict[str, Any]:
     return {
         "name": "clothing-combo-advisor",
         "version": "1.0.0",
+        "model_version": model_holder.current.version,
+        "model_loaded_at": model_holder.info()["model_loaded_at"],
         "description": "An MCP service that evaluates clothing combinations",
         "input_schema": {
             "type": "object",
@@ -251,11 +816,54 @@ def get_metadata():
         }
     }
 
+# Native MCP: the actions above as tools, over JSON-RPC 2.0 on
+# POST /mcp/rpc (streamable HTTP) or stdin/stdout (python main.py --stdio)
+mcp_server = MCPServer(
+    "clothing-combo-advisor", "1.0.0",
+    tools=lambda: [
+        {"name": action["name"], "description": action["description"], "inputSchema": action["parameters"]}
+        for action in actions_document()["actions"]
+    ],
+    call_tool=run_action,
+)
+
+@app.post("/mcp/rpc")
+async def mcp_rpc(request: Request):
+    """
+    MCP streamable HTTP transport. The body is one JSON-RPC message or a
+    batch array. Batches are answered as a JSON array, or, if the client
+    accepts text/event-stream, as one event per response in completion order.
+    Notifications alone get 202. The server keeps no session state.
+    """
+    try:
+        payload = loads(await request.body())
+    except ValueError:
+        return RawJSONResponse(dumps(rpc_error(None, PARSE_ERROR, "Parse error")), status_code=400)
+
+    if (isinstance(payload, list) and sum(map(is_request, payload)) > 1
+            and "text/event-stream" in request.headers.get("accept", "")):
+        return StreamingResponse(mcp_server.stream_batch(payload), media_type="text/event-stream")
+
+    response = await mcp_server.handle_payload(payload)
+    if response is None:
+        return Response(status_code=202)
+    return RawJSONResponse(dumps(response))
+
+# Re-encoded when a reload changes the model version
+metadata_json = StaticJSON(metadata_document, key=lambda: (model_holder.current.version, model_holder.current.loaded_at))
+
 @app.post("/v1/models/clothing-advisor:predict")
 async def mcp_predict(request: MCPInspectorRequest):
     """
     MCP Inspector compatible prediction endpoint
     """
+    # Batch form: score every instance in one model call
+    if request.instances is not None:
+        return FastJSONResponse({"predictions": await evaluate_outfits_async(request.instances)})
+
+    if request.inputs is None:
+        raise HTTPException(status_code=400, detail="Request must contain 'inputs' or 'instances'")
+
     # Extract the clothing combination from the Inspector request format
     input_data = request.inputs
     
@@ -267,14 +875,72 @@ async def mcp_predict(request: MCPInspectorRequest):
         "bottom_color": input_data.get("bottom_color", "")
     }
     
-    # Process using your existing function
-    result = evaluate_outfit(outfit_data)
-    
-    # Return in MCP Inspector compatible format
-    return {
-        "predictions": [result]
-    }
+    # Process using your existing function, returned in MCP Inspector
+    # compatible format
+    return RawJSONResponse(await outfit_body("predict", outfit_data, lambda result: {"predictions": [result]}))
+
+# Rows scored per evaluate_outfits call on the streaming endpoint
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 1000))
+
+async def ndjson_lines(request: Request):
+    """Non-empty lines of the request body, read as it arrives"""
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that lets the body generator keep reading the request.
+    The stock one also waits on receive() for a disconnect, which would steal
+    request body messages; here a disconnect ends request.stream() instead.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/v1/models/clothing-advisor:stream")
+async def mcp_predict_stream(request: Request):
+    """
+    Bulk scoring: an NDJSON body with one outfit per line, answered with one
+    NDJSON result per line in the same order. Rows are scored in chunks as
+    they arrive, so neither side buffers the whole payload.
+    """
+    async def results():
+        chunk = []
+        async for line in ndjson_lines(request):
+            chunk.append(parse_ndjson_line(line))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield await score_stream_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield await score_stream_chunk(chunk)
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+async def score_stream_chunk(records: List[Any]) -> bytes:
+    results = merge_results(records, await evaluate_outfits_async(split_records(records)), error_response)
+    return b"".join(dumps(result) + b"\n" for result in results)
 
 if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    if "--stdio" in sys.argv:
+        # MCP over stdin/stdout for agents that launch the server themselves
+        async def serve_stdio():
+            async with lifespan(app):
+                await mcp_server.serve_stdio(max_in_flight=int(os.environ.get("MCP_MAX_IN_FLIGHT", 256)))
+        asyncio.run(serve_stdio())
+    elif "--production" in sys.argv or os.environ.get("MCP_ENV") == "production":
+        # Multi-worker server configured from mcp_config.json. Register this
+        # module as 'main' so the server reuses the model loaded above.
+        sys.modules.setdefault("main", sys.modules["__main__"])
+        from server import run_production
+        run_production()
+    else:
+        port = int(os.environ.get("PORT", 8000))
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
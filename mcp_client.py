@@ -0,0 +1,105 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+
+import tracing
+
+# Status codes worth retrying: the server is restarting or overloaded
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class MCPServerError(Exception):
+    """The MCP server could not be reached or returned an error"""
+
+
+class MCPClient:
+    """
+    Long-lived client for the MCP server, meant to be opened once per app.
+
+    transport selects how calls reach the server:
+      - "http":   pooled keep-alive HTTP connections to url
+      - "asgi":   main.app called in-process through ASGI, no network hop
+      - "direct": main.evaluate_outfit_async called as a plain function
+
+    The in-process transports don't start main.app; whoever owns the client
+    runs main.lifespan around it (bee_integration.py does).
+    """
+
+    def __init__(self, url: str, transport: str = "http",
+                 max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, timeout: float = 5.0,
+                 retries: int = 2, backoff: float = 0.05):
+        if transport not in ("http", "asgi", "direct"):
+            raise ValueError(f"Unknown MCP transport: {transport}")
+        self.url = url
+        self.transport = transport
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self._model_version: Optional[str] = None
+
+    @property
+    def model_version(self) -> Optional[str]:
+        """
+        The model answering calls: main's current version in-process, or the
+        X-Model-Version of the server's last response (None before the first)
+        """
+        if self.transport != "http":
+            import main
+            return main.model_holder.current.version
+        return self._model_version
+
+    async def start(self):
+        if self._client is not None or self.transport == "direct":
+            return
+        if self.transport == "asgi":
+            import main
+            self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                                             base_url="http://mcp", timeout=self.timeout)
+        else:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call(self, action: str, action_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Run an MCP action and return the contents of its 'response' field"""
+        if self.transport == "direct":
+            import main
+            if action == "evaluate_outfit":
+                # Stands in for main's server span, so its stages are
+                # attributed to main here too and not to the caller
+                with tracing.span(f"direct {action}", service=main.TRACE_SERVICE, transport="direct"):
+                    return await main.evaluate_outfit_async(action_input)
+            raise MCPServerError(f"Unsupported action: {action}")
+
+        await self.start()
+        url = "/mcp" if self.transport == "asgi" else self.url
+        payload = {"action": action, "action_input": action_input}
+
+        for attempt in range(self.retries + 1):
+            try:
+                # The server joins the caller's trace through traceparent
+                with tracing.span("mcp_client.post", attempt=attempt):
+                    response = await self._client.post(url, json=payload, headers=tracing.inject_headers())
+            except httpx.TransportError as e:
+                error = MCPServerError(f"MCP server unreachable: {e}")
+            else:
+                if response.status_code == 200:
+                    self._model_version = response.headers.get("x-model-version", self._model_version)
+                    return response.json()["response"]
+                error = MCPServerError(f"MCP server returned {response.status_code}")
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise error
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+        raise error
@@ -0,0 +1,175 @@
+import asyncio
+import sys
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fast_json import dumps, loads
+
+# Newest first; a client asking for one of these gets it, anyone else the newest
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class JSONRPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def rpc_error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def is_request(message: Any) -> bool:
+    """A message that expects a response (has both a method and an id)"""
+    return isinstance(message, dict) and "method" in message and "id" in message
+
+
+def sse_event(body: bytes) -> bytes:
+    return b"event: message\ndata: " + body + b"\n\n"
+
+
+class MCPServer:
+    """
+    Model Context Protocol over JSON-RPC 2.0, independent of the transport.
+
+    Tools are described by name, description and inputSchema, and run by
+    call_tool(name, arguments), which raises KeyError for an unknown tool and
+    ValueError for arguments it can't use. Every message is handled as its
+    own task, so one session can have many calls in flight: batch arrays are
+    answered once all their calls finish, single messages as soon as each
+    one does, in whatever order that is.
+    """
+
+    def __init__(self, name: str, version: str, tools: Callable[[], List[Dict[str, Any]]],
+                 call_tool: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        self.server_info = {"name": name, "version": version}
+        self.tools = tools
+        self.call_tool = call_tool
+
+    async def handle_message(self, message: Any) -> Optional[Dict[str, Any]]:
+        """The response to one message, or None for notifications and client responses"""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+            return rpc_error(None, INVALID_REQUEST, "Invalid Request")
+        if "method" not in message:
+            # A response to a server request; we never send any
+            return None
+
+        request_id = message.get("id")
+        method = message["method"]
+        params = message.get("params", {})
+        if not isinstance(method, str) or not isinstance(params, dict):
+            return rpc_error(request_id, INVALID_REQUEST, "Invalid Request")
+
+        try:
+            result = await self.dispatch(method, params)
+        except JSONRPCError as e:
+            response = rpc_error(request_id, e.code, e.message)
+        except Exception as e:
+            response = rpc_error(request_id, INTERNAL_ERROR, f"Internal error: {e}")
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        return response if "id" in message else None
+
+    async def dispatch(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "tools/call":
+            return await self._call_tool(params)
+        if method == "tools/list":
+            return {"tools": self.tools()}
+        if method == "initialize":
+            requested = params.get("protocolVersion")
+            return {
+                "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": self.server_info,
+            }
+        if method == "ping":
+            return {}
+        if method.startswith("notifications/"):
+            return None
+        raise JSONRPCError(METHOD_NOT_FOUND, f"Method not found: {method}")
+
+    async def _call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        name = params.get("name")
+        arguments = params.get("arguments") or {}
+        if not isinstance(name, str) or not isinstance(arguments, dict):
+            raise JSONRPCError(INVALID_PARAMS, "tools/call needs a tool name and an arguments object")
+        try:
+            result = await self.call_tool(name, arguments)
+        except KeyError:
+            raise JSONRPCError(INVALID_PARAMS, f"Unknown tool: {name}")
+        except ValueError as e:
+            # Tool errors go back as results so the model can see and correct them
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        return {
+            "content": [{"type": "text", "text": dumps(result).decode("utf-8")}],
+            "structuredContent": result,
+            "isError": False,
+        }
+
+    async def handle_payload(self, payload: Any) -> Optional[Any]:
+        """Handle a single message or a batch array; None if nothing needs a response"""
+        if isinstance(payload, list):
+            if not payload:
+                return rpc_error(None, INVALID_REQUEST, "Invalid Request")
+            responses = await asyncio.gather(*(self.handle_message(message) for message in payload))
+            responses = [response for response in responses if response is not None]
+            return responses or None
+        return await self.handle_message(payload)
+
+    async def handle_bytes(self, body: bytes) -> Optional[bytes]:
+        try:
+            payload = loads(body)
+        except ValueError:
+            return dumps(rpc_error(None, PARSE_ERROR, "Parse error"))
+        response = await self.handle_payload(payload)
+        return dumps(response) if response is not None else None
+
+    async def stream_batch(self, messages: List[Any]) -> AsyncIterator[bytes]:
+        """Server-sent events for a batch, one per response as soon as it is ready"""
+        for done in asyncio.as_completed([self.handle_message(message) for message in messages]):
+            response = await done
+            if response is not None:
+                yield sse_event(dumps(response))
+
+    async def serve_stdio(self, stdin=None, stdout=None, max_in_flight: int = 256):
+        """
+        Newline-delimited JSON-RPC on stdin/stdout until stdin closes. Up to
+        max_in_flight messages are handled at once and each response is
+        written when it is ready, so a slow call never holds up the others.
+        """
+        stdin = stdin or sys.stdin.buffer
+        stdout = stdout or sys.stdout.buffer
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+
+        async def handle(line: bytes):
+            try:
+                response = await self.handle_bytes(line)
+                if response is not None:
+                    # Whole lines from the event loop thread, so never interleaved
+                    stdout.write(response + b"\n")
+                    stdout.flush()
+            finally:
+                slots.release()
+
+        while True:
+            line = await loop.run_in_executor(None, stdin.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(handle(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
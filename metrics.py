@@ -0,0 +1,194 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from request_log import add_stage_time
+from tracing import end_child_span, start_child_span
+
+# Histogram bucket upper bounds in seconds, from 10us (table lookups) to 2.5s
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help, value) rows returned by collectors
+Sample = Tuple[str, str, str, float]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and three adds"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _StageTimer:
+    __slots__ = ("name", "histogram", "start", "span")
+
+    def __init__(self, name: str, histogram: Histogram):
+        self.name = name
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        # A trace span too, if this request is being traced
+        self.span = start_child_span(self.name, self.start)
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        elapsed = end - self.start
+        self.histogram.observe(elapsed)
+        # Also into the access log entry, if this request is being logged
+        add_stage_time(self.name, elapsed)
+        if self.span is not None:
+            end_child_span(self.span, end)
+        return False
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+class Metrics:
+    """
+    Per-stage latency histograms, per-endpoint request counts and latencies,
+    error counters and pluggable collectors, rendered as Prometheus text.
+    Metric names are prefixed so two apps can share a process.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.stages: Dict[str, Histogram] = {}
+        self.request_latency: Dict[str, Histogram] = {}
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.errors: Dict[str, int] = {}
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def stage(self, name: str) -> _StageTimer:
+        """Context manager that records the time spent in a named stage"""
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = Histogram()
+        return _StageTimer(name, histogram)
+
+    def observe_request(self, path: str, method: str, status: int, seconds: float):
+        key = (path, method, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.request_latency.get(path)
+        if histogram is None:
+            histogram = self.request_latency[path] = Histogram()
+        histogram.observe(seconds)
+
+    def count_error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Register a callable returning extra samples at scrape time"""
+        self.collectors.append(collector)
+
+    def _histogram_lines(self, name: str, label: str, histograms: Dict[str, Histogram]) -> List[str]:
+        lines = []
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels(**{label: key, "le": repr(bound)})}}} {cumulative}')
+            lines.append(f'{name}_bucket{{{_labels(**{label: key, "le": "+Inf"})}}} {histogram.count}')
+            lines.append(f'{name}_sum{{{_labels(**{label: key})}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{_labels(**{label: key})}}} {histogram.count}')
+        return lines
+
+    def render(self) -> str:
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent in each stage of request handling",
+            f"# TYPE {p}_stage_seconds histogram",
+            *self._histogram_lines(f"{p}_stage_seconds", "stage", self.stages),
+            f"# HELP {p}_request_seconds End-to-end request latency per endpoint",
+            f"# TYPE {p}_request_seconds histogram",
+            *self._histogram_lines(f"{p}_request_seconds", "path", self.request_latency),
+            f"# HELP {p}_requests_total Requests per endpoint, method and status code",
+            f"# TYPE {p}_requests_total counter",
+        ]
+        for (path, method, status), count in sorted(self.requests.items()):
+            lines.append(f"{p}_requests_total{{{_labels(path=path, method=method, status=status)}}} {count}")
+
+        lines += [f"# HELP {p}_errors_total Errors returned to callers, by kind",
+                  f"# TYPE {p}_errors_total counter"]
+        for kind, count in sorted(self.errors.items()):
+            lines.append(f"{p}_errors_total{{{_labels(kind=kind)}}} {count}")
+
+        for collector in self.collectors:
+            for name, metric_type, help_text, value in collector():
+                lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {metric_type}",
+                          f"{p}_{name} {value}"]
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per endpoint. Paths
+    that aren't app routes are grouped as 'other' to bound label cardinality.
+    """
+
+    def __init__(self, app, metrics: Metrics, paths: Optional[Callable[[], Iterable[str]]] = None):
+        self.app = app
+        self.metrics = metrics
+        self.paths = paths
+        self._known_paths: Optional[set] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self._known_paths is None:
+            self._known_paths = set(self.paths()) if self.paths else set()
+        path = scope["path"] if scope["path"] in self._known_paths else "other"
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.observe_request(path, scope["method"], status, time.perf_counter() - start)
+
+
+def cache_collector(cache) -> Callable[[], List[Sample]]:
+    """Collector exposing a ResponseCache's counters and hit ratio"""
+    def collect() -> List[Sample]:
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        return [
+            ("cache_hits_total", "counter", "Response cache hits", stats["hits"]),
+            ("cache_misses_total", "counter", "Response cache misses", stats["misses"]),
+            ("cache_coalesced_total", "counter", "Misses that joined an in-flight computation", stats["coalesced"]),
+            ("cache_evictions_total", "counter", "Entries evicted to stay within max_size", stats["evictions"]),
+            ("cache_invalidations_total", "counter", "Full clears after artifact changes", stats["invalidations"]),
+            ("cache_entries", "gauge", "Entries currently cached", stats["size"]),
+            ("cache_hit_ratio", "gauge", "Hits over lookups since start", stats["hits"] / lookups if lookups else 0.0),
+        ]
+    return collect
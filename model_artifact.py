@@ -0,0 +1,112 @@
+# Versioned on-disk model artifact that loads without pickle or sklearn.
+#
+#   manifest.json                 format version, model version, vocabularies
+#                                 and the .npy file behind every array
+#   <model_version>.<name>.npy    one plain numpy array per file
+#
+# Arrays are opened with mmap_mode='r', so every worker on a host shares one
+# page-cache copy instead of holding a private unpickled forest. The manifest
+# is written last and replaced atomically, so readers see complete versions.
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from forest_engine import FlatForest, FOREST_ARRAYS
+from prediction_table import FEATURES, PredictionTable
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+DEFAULT_ARTIFACT_DIR = 'model_artifact'
+
+
+class ModelArtifact:
+    """Everything the server needs to score outfits, loaded from one artifact"""
+
+    def __init__(self, manifest: Dict[str, Any], model: FlatForest,
+                 vocabularies: Dict[str, List[str]], prediction_table: Optional[PredictionTable]):
+        self.manifest = manifest
+        self.model = model
+        self.vocabularies = vocabularies
+        self.prediction_table = prediction_table
+
+    @property
+    def version(self) -> str:
+        return self.manifest['model_version']
+
+
+def save_artifact(directory: str, forest: FlatForest, vocabularies: Dict[str, List[str]],
+                  prediction_table: Optional[PredictionTable] = None,
+                  training: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Write a new artifact version and return its manifest (training: how the model was chosen)"""
+    os.makedirs(directory, exist_ok=True)
+    model_version = time.strftime('%Y%m%d%H%M%S') + f'-{os.getpid()}'
+
+    arrays = {f'forest.{name}': array for name, array in forest.arrays().items()}
+    if prediction_table is not None:
+        arrays['table.predictions'] = prediction_table.predictions
+        arrays['table.confidences'] = prediction_table.confidences
+
+    files = {}
+    for name, array in arrays.items():
+        filename = f'{model_version}.{name}.npy'
+        np.save(os.path.join(directory, filename), np.asarray(array, order='C'), allow_pickle=False)
+        files[name] = {'file': filename, 'dtype': str(array.dtype), 'shape': list(np.shape(array))}
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'model_version': model_version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'features': list(FEATURES),
+        'vocabularies': {feature: list(vocabularies[feature]) for feature in FEATURES},
+        'table_shape': list(prediction_table.shape) if prediction_table is not None else None,
+        'arrays': files,
+        'training': training,
+    }
+
+    tmp_path = os.path.join(directory, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+    # Drop files from older versions; processes still mapping them keep the
+    # unlinked inodes alive until they reload
+    referenced = {entry['file'] for entry in files.values()} | {MANIFEST}
+    for filename in os.listdir(directory):
+        if filename.endswith('.npy') and filename not in referenced:
+            os.remove(os.path.join(directory, filename))
+
+    return manifest
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, MANIFEST)) as file:
+        manifest = json.load(file)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+    return manifest
+
+
+def load_artifact(directory: str = DEFAULT_ARTIFACT_DIR, mmap: bool = True) -> ModelArtifact:
+    """Open an artifact, memory-mapping its arrays unless mmap is False"""
+    manifest = read_manifest(directory)
+
+    def array(name):
+        entry = manifest['arrays'][name]
+        return np.load(os.path.join(directory, entry['file']),
+                       mmap_mode='r' if mmap else None, allow_pickle=False)
+
+    model = FlatForest({name: array(f'forest.{name}') for name in FOREST_ARRAYS})
+
+    prediction_table = None
+    if manifest.get('table_shape') is not None:
+        prediction_table = PredictionTable(tuple(manifest['table_shape']),
+                                           array('table.predictions'), array('table.confidences'))
+
+    return ModelArtifact(manifest, model, manifest['vocabularies'], prediction_table)
+
+
+def artifact_exists(directory: str = DEFAULT_ARTIFACT_DIR) -> bool:
+    return os.path.exists(os.path.join(directory, MANIFEST))
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from forest_engine import FlatForest
+from model_artifact import MANIFEST, artifact_exists, load_artifact
+from prediction_table import FEATURES, PredictionTable, build_prediction_table
+from vocab_encoder import VocabularyEncoder, vocabularies_from_encoders
+
+MODEL_PICKLE = 'clothing_combo_model.pkl'
+ENCODERS_PICKLE = 'encoders.pkl'
+
+
+class ModelVersion:
+    """One loaded model with its vocabularies, encoder and prediction table"""
+
+    def __init__(self, version: str, model: FlatForest, vocabularies: Dict[str, List[str]],
+                 prediction_table: Optional[PredictionTable], source: str):
+        self.version = version
+        self.model = model
+        self.vocabularies = vocabularies
+        self.vocab_encoder = VocabularyEncoder(vocabularies)
+        self.prediction_table = prediction_table
+        self.source = source
+        self.loaded_at = time.time()
+
+
+def source_signature(artifact_dir: str) -> Tuple:
+    """mtime and size of the files a model is loaded from; changes mean a new model"""
+    signature = []
+    for path in (os.path.join(artifact_dir, MANIFEST), MODEL_PICKLE, ENCODERS_PICKLE):
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def load_model_version(artifact_dir: str) -> ModelVersion:
+    """
+    Load the memory-mapped artifact from train_model.py, which needs neither
+    pickle nor sklearn, or fall back to the pickles if it is missing
+    """
+    if artifact_exists(artifact_dir):
+        artifact = load_artifact(artifact_dir)
+        return ModelVersion(artifact.version, artifact.model, artifact.vocabularies,
+                            artifact.prediction_table, source=artifact_dir)
+
+    with open(MODEL_PICKLE, 'rb') as file:
+        model = FlatForest.from_sklearn(pickle.load(file)).compact()
+    with open(ENCODERS_PICKLE, 'rb') as file:
+        vocabularies = vocabularies_from_encoders(pickle.load(file))
+
+    # Score the whole vocabulary once so requests are a single table lookup
+    # (None if the vocabulary is too large, in which case we run the model live)
+    prediction_table = build_prediction_table(model, vocabularies)
+    version = 'pickle-' + time.strftime('%Y%m%d%H%M%S', time.localtime(os.stat(MODEL_PICKLE).st_mtime))
+    return ModelVersion(version, model, vocabularies, prediction_table, source=MODEL_PICKLE)
+
+
+def validate_model_version(candidate: ModelVersion, probe_outfits: Sequence[Dict[str, Any]] = ()):
+    """
+    Raise ValueError unless the candidate can score outfits: the table must
+    match the vocabularies and the model must return sane probabilities.
+    Scoring the probe outfits also pages in the arrays the requests will touch.
+    """
+    shape = tuple(len(candidate.vocabularies[feature]) for feature in FEATURES)
+    if min(shape) == 0:
+        raise ValueError("Empty vocabulary")
+    if candidate.prediction_table is not None and tuple(candidate.prediction_table.shape) != shape:
+        raise ValueError(f"Prediction table shape {candidate.prediction_table.shape} "
+                         f"does not match the vocabularies {shape}")
+
+    X, valid = candidate.vocab_encoder.encode_many(list(probe_outfits))
+    X = np.vstack([np.zeros((1, len(FEATURES)), dtype=np.int64), X[valid]])
+    proba = candidate.model.predict_proba(X)
+    if proba.shape != (len(X), len(candidate.model.classes_)) or not np.all(np.isfinite(proba)):
+        raise ValueError("Model returned malformed probabilities")
+    if not np.allclose(proba.sum(axis=1), 1.0):
+        raise ValueError("Model probabilities do not sum to 1")
+
+    if candidate.prediction_table is not None:
+        confidences = candidate.prediction_table.lookup_many(X)[1]
+        if not np.allclose(confidences, proba[:, 1]):
+            raise ValueError("Prediction table disagrees with the model")
+        # Touch every page of the table so the first requests don't fault them in
+        float(np.asarray(candidate.prediction_table.confidences).sum())
+
+
+class ModelHolder:
+    """
+    Serves the active ModelVersion and swaps in new ones without a restart.
+
+    Request handlers read holder.current once and use that object for the
+    whole request, so a swap never changes the model under a request that is
+    already running: in-flight requests finish on the old version while new
+    ones see the new one. Reloads load, validate and warm the candidate on a
+    worker thread and only replace current (a single reference assignment)
+    if every step succeeds.
+    """
+
+    def __init__(self, load: Callable[[], ModelVersion], signature: Callable[[], Any],
+                 validate: Optional[Callable[[ModelVersion], None]] = None):
+        self.load = load
+        self.signature = signature
+        self.validate = validate
+        self._signature = signature()
+        self.current = load()
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_error: Optional[str] = None
+        self.listeners: List[Callable[[ModelVersion, ModelVersion], None]] = []
+
+    def reload(self, force: bool = True) -> bool:
+        """
+        Load, validate and swap in the model on disk. Without force, only
+        reload if the source files changed. Returns True if a new version is
+        now active; on failure the current version keeps serving.
+        """
+        with self._lock:
+            signature = self.signature()
+            if not force and signature == self._signature:
+                return False
+            try:
+                candidate = self.load()
+                if self.validate is not None:
+                    self.validate(candidate)
+            except Exception as e:
+                self.reload_failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                # Don't retry a broken file every poll; wait for it to change again
+                self._signature = signature
+                return False
+            if not force and candidate.version == self.current.version:
+                # e.g. the pickles were rewritten but the artifact wasn't (yet)
+                self._signature = signature
+                return False
+
+            previous, self.current = self.current, candidate
+            self._signature = signature
+            self.reloads += 1
+            self.last_error = None
+
+        for listener in self.listeners:
+            listener(previous, candidate)
+        return True
+
+    async def reload_async(self, force: bool = True) -> bool:
+        """reload() on a worker thread, so the event loop keeps serving"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.reload, force)
+
+    async def watch(self, interval: float):
+        """Poll the source files and reload when they change, until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            if self.signature() != self._signature:
+                await self.reload_async(force=False)
+
+    def info(self) -> Dict[str, Any]:
+        current = self.current
+        return {
+            "model_version": current.version,
+            "model_source": current.source,
+            "model_loaded_at": time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(current.loaded_at)),
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_reload_error": self.last_error,
+        }
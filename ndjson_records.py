@@ -0,0 +1,25 @@
+import json
+from typing import Any, Callable, Dict, Iterable, List
+
+
+def parse_ndjson_line(line: str) -> Any:
+    """One NDJSON record; a line that isn't valid JSON becomes the error for that row"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+
+def split_records(records: List[Any]) -> List[Any]:
+    """The records that parsed, to be scored together"""
+    return [record for record in records if not isinstance(record, Exception)]
+
+
+def merge_results(records: List[Any], scored: Iterable[Dict[str, Any]],
+                  error_response: Callable[[Exception], Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One result per record in input order: the scores of split_records(records)
+    with each parse error put back in place as error_response(error)
+    """
+    scored = iter(scored)
+    return [error_response(record) if isinstance(record, Exception) else next(scored) for record in records]
@@ -0,0 +1,56 @@
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+
+# Order of the model's input features
+FEATURES = ['top_type', 'top_color', 'bottom_type', 'bottom_color']
+
+# Above this many combinations we skip the table and fall back to live inference
+MAX_TABLE_SIZE = 2_000_000
+
+
+class PredictionTable:
+    """Precomputed model output for every combination in the encoder vocabularies"""
+
+    def __init__(self, shape: Tuple[int, ...], predictions: np.ndarray, confidences: np.ndarray):
+        self.shape = shape
+        self.predictions = predictions
+        self.confidences = confidences
+
+    def lookup(self, codes) -> Tuple[int, float]:
+        """Return (prediction, confidence) for one tuple of encoded features"""
+        index = np.ravel_multi_index(tuple(codes), self.shape)
+        return int(self.predictions[index]), float(self.confidences[index])
+
+    def lookup_many(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized lookup for an (n, 4) array of encoded features"""
+        index = np.ravel_multi_index(tuple(np.asarray(codes).T), self.shape)
+        return self.predictions[index], self.confidences[index]
+
+    def confidence_slice(self, codes: Sequence[Optional[int]]) -> np.ndarray:
+        """
+        Confidences with some features fixed. None leaves a feature free, and
+        the result has one axis per free feature, in FEATURES order.
+        """
+        index = tuple(slice(None) if code is None else code for code in codes)
+        return self.confidences.reshape(self.shape)[index]
+
+
+def build_prediction_table(model, vocabularies: Dict[str, Sequence[str]],
+                           max_size: int = MAX_TABLE_SIZE) -> Optional[PredictionTable]:
+    """
+    Score every (top_type, top_color, bottom_type, bottom_color) tuple once.
+    Returns None when the vocabulary is too large to enumerate.
+    """
+    shape = tuple(len(vocabularies[feature]) for feature in FEATURES)
+    size = int(np.prod(shape))
+    if size == 0 or size > max_size:
+        return None
+
+    # Rows are laid out in C order so a flat index is np.ravel_multi_index(codes, shape)
+    grid = np.indices(shape).reshape(len(shape), -1).T
+    proba = model.predict_proba(grid)
+
+    # Same decision rule as model.predict: the class with the highest probability
+    predictions = model.classes_[np.argmax(proba, axis=1)].astype(np.uint8)
+    confidences = proba[:, 1].copy()
+    return PredictionTable(shape, predictions, confidences)
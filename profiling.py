@@ -0,0 +1,114 @@
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ProfileStore:
+    """The most recent request profiles, oldest dropped first"""
+
+    def __init__(self, capacity: int = 50):
+        self._profiles = deque(maxlen=max(1, capacity))
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile_id: int, info: Dict[str, Any], profile: cProfile.Profile):
+        profile.create_stats()
+        # Kept in the marshalled .prof format; reports are rendered on demand
+        self._profiles.append(dict(info, id=profile_id, stats=marshal.dumps(profile.stats)))
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [{key: value for key, value in entry.items() if key != "stats"} for entry in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        return next((entry for entry in self._profiles if entry["id"] == profile_id), None)
+
+    @staticmethod
+    def report(entry: Dict[str, Any], sort: str = "cumulative", limit: int = 40) -> str:
+        """pstats text report for a stored profile"""
+        stats = pstats.Stats(_MarshalledStats(entry["stats"]), stream=io.StringIO())
+        stats.sort_stats(sort).print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _MarshalledStats:
+    # pstats.Stats loads anything with create_stats() and a stats dict
+    def __init__(self, data: bytes):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that runs selected requests under cProfile: those
+    sending the trigger header (when allowed) and a random sample_rate share
+    of the rest. Profiled responses carry an X-Profile-Id header. Only
+    install it when profiling is wanted; without it the request path has no
+    profiling code at all.
+
+    cProfile sees everything on the event loop thread while it is enabled,
+    so a profile can include other requests interleaved with this one. One
+    request is profiled at a time; triggers during it run unprofiled.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0,
+                 header: str = "x-profile", allow_header: Callable[[Dict[bytes, bytes]], bool] = lambda headers: True):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.allow_header = allow_header
+        self._busy = False
+
+    def _trigger(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        if headers.get(self.header, b"") not in (b"", b"0") and self.allow_header(headers):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" and not self._busy else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        profile_id = self.store.next_id()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Tell the caller where to find the profile
+                message = dict(message, headers=[*message.get("headers", []),
+                                                 (b"x-profile-id", str(profile_id).encode())])
+            await send(message)
+
+        self._busy = True
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.disable()
+            self._busy = False
+            self.store.add(profile_id, {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "trigger": trigger,
+            }, profile)
@@ -0,0 +1,178 @@
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fast_json import dumps
+
+access_logger = logging.getLogger("advisor.access")
+error_logger = logging.getLogger("advisor.error")
+
+# Silent until RequestLog.start(), e.g. in bulk_score workers
+for _logger in (access_logger, error_logger):
+    _logger.addHandler(logging.NullHandler())
+    _logger.propagate = False
+
+# Used for anything the logging section of mcp_config.json doesn't set
+DEFAULT_LOGGING_SETTINGS = {
+    "level": "info",
+    "file": "mcp_server.log",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "access_sample_rate": 1.0,  # Share of requests written to the access log
+    "queue_size": 10000,  # Records waiting for the writer thread before new ones are dropped
+}
+
+# Fields gathered for the access log entry of the current request (stage
+# timings, outfit key, ...); None when the request isn't being logged
+request_fields: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_fields", default=None)
+
+
+def annotate(**fields):
+    """Add fields to the current request's access log entry, if it has one"""
+    current = request_fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def add_stage_time(name: str, seconds: float):
+    current = request_fields.get()
+    if current is not None:
+        stages = current.setdefault("stages_ms", {})
+        stages[name] = round(stages.get(name, 0.0) + seconds * 1000, 4)
+
+
+def log_error(message: str, error: BaseException):
+    """Error log entry with the traceback and whatever the request has gathered so far"""
+    if error_logger.isEnabledFor(logging.ERROR):
+        error_logger.error(message, exc_info=(type(error), error, error.__traceback__),
+                           extra={"fields": dict(request_fields.get() or {})})
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, then the record's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + ".%03d" % record.msecs,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return dumps(entry).decode("utf-8")
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread as they are. Formatting, including
+    tracebacks, happens on that thread, and a full queue drops the record
+    (counted in dropped) instead of making the caller wait.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLog:
+    """The queue handler, writer thread and settings behind the access and error logs"""
+
+    def __init__(self, settings: Dict[str, Any], worker_id: Optional[str] = None):
+        self.settings = settings
+        path = settings["file"]
+        if worker_id is not None:
+            # One file per worker process: rotation isn't safe across processes
+            root, extension = os.path.splitext(path)
+            path = f"{root}.{worker_id}{extension}"
+        self.path = path
+        self.sample_rate = float(settings["access_sample_rate"])
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(settings["max_bytes"]), backupCount=int(settings["backup_count"]), encoding="utf-8")
+        file_handler.setFormatter(JSONFormatter())
+
+        self.queue: queue.Queue = queue.Queue(maxsize=int(settings["queue_size"]))
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, file_handler)
+
+    def start(self):
+        level = getattr(logging, str(self.settings["level"]).upper(), logging.INFO)
+        for logger in (access_logger, error_logger):
+            logger.addHandler(self.handler)
+            logger.setLevel(level)
+        self.listener.start()
+
+    def stop(self):
+        """Detach from the loggers and write out whatever is still queued"""
+        for logger in (access_logger, error_logger):
+            logger.removeHandler(self.handler)
+            logger.setLevel(logging.NOTSET)
+        self.listener.stop()
+
+
+def logging_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    settings = dict(DEFAULT_LOGGING_SETTINGS)
+    settings.update(config.get("logging", {}))
+    if "ACCESS_LOG_SAMPLE_RATE" in os.environ:
+        settings["access_sample_rate"] = float(os.environ["ACCESS_LOG_SAMPLE_RATE"])
+    return settings
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware writing one access log entry per sampled request: method,
+    path, status, total time, and the fields handlers add with annotate()
+    and the stage timers record. Requests that aren't sampled pay for one
+    random() call and nothing else.
+    """
+
+    def __init__(self, app, sample_rate: Callable[[], float] = lambda: 1.0):
+        self.app = app
+        # A callable so the rate can come from config loaded at startup
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not access_logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+        rate = self.sample_rate()
+        if rate < 1.0 and random.random() >= rate:
+            await self.app(scope, receive, send)
+            return
+
+        fields: Dict[str, Any] = {"method": scope["method"], "path": scope["path"]}
+        token = request_fields.set(fields)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_fields.reset(token)
+            fields["status"] = status
+            fields["duration_ms"] = round((time.perf_counter() - start) * 1000, 4)
+            access_logger.info("request", extra={"fields": fields})
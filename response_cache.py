@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from prediction_table import FEATURES
+
+_MISSING = object()
+
+
+class _ComputationCancelled(Exception):
+    """Given to the waiters of a computation whose own caller was cancelled"""
+
+
+def outfit_cache_key(input_data: Dict[str, Any], features: Sequence[str] = FEATURES) -> Optional[Tuple[str, ...]]:
+    """
+    The four outfit fields as a tuple, ignoring any other keys. Returns None
+    (don't cache) if a field is present but isn't a string.
+    """
+    key = []
+    for feature in features:
+        value = input_data.get(feature, '')
+        if not isinstance(value, str):
+            return None
+        key.append(value)
+    return tuple(key)
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache with a TTL and single-flight misses.
+
+    Concurrent get_or_compute calls for the same missing key share one
+    computation. If version is given it is polled at most every
+    check_interval seconds, and the cache is cleared whenever it changes.
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: float = 300.0,
+                 version: Optional[Callable[[], Hashable]] = None, check_interval: float = 1.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._version = version() if version else None
+        self._checked_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        if self.version is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        current = self.version()
+        if current != self._version:
+            self._version = current
+            self.clear()
+            self.invalidations += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value, joining an identical in-flight computation if
+        there is one. If the caller running that computation is cancelled, the
+        callers waiting on it aren't: they start over, and one of them computes.
+        """
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _ComputationCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except BaseException as e:
+            future.set_exception(_ComputationCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            future.exception()  # Re-raised to each waiter, not logged as unretrieved
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+        }
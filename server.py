@@ -0,0 +1,148 @@
+import json
+import os
+import signal
+import socket
+import time
+from typing import Any, Dict, Tuple
+
+import uvicorn
+
+CONFIG_PATH = 'mcp_config.json'
+
+# Used for anything mcp_config.json doesn't set
+DEFAULT_SERVER_SETTINGS = {
+    "workers": 0,  # 0 means one per CPU core
+    "backlog": 2048,
+    "timeout_graceful_shutdown": 30,
+    "timeout_keep_alive": 5,
+}
+
+# A worker that dies sooner than this after starting is restarted only after
+# the same delay, so one that crashes on startup doesn't fork in a tight loop
+RESPAWN_BACKOFF = 1.0
+
+
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def production_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge mcp_config.json's http endpoint, server and logging sections"""
+    http = config.get("endpoints", {}).get("http", {})
+    settings = dict(DEFAULT_SERVER_SETTINGS)
+    settings.update(config.get("server", {}))
+    settings["host"] = http.get("host", "127.0.0.1")
+    settings["port"] = int(os.environ.get("PORT", http.get("port", 8000)))
+    settings["log_level"] = config.get("logging", {}).get("level", "info")
+    settings["workers"] = int(os.environ.get("WEB_CONCURRENCY", settings["workers"])) or os.cpu_count() or 1
+    return settings
+
+
+def _uvicorn_config(app, settings: Dict[str, Any]) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        log_level=settings["log_level"],
+        timeout_graceful_shutdown=settings["timeout_graceful_shutdown"],
+        timeout_keep_alive=settings["timeout_keep_alive"],
+        backlog=settings["backlog"],
+    )
+
+
+def run_production(config_path: str = CONFIG_PATH):
+    """
+    Serve main.app on every core.
+
+    The model is loaded once in the parent, which then binds the listening
+    socket and forks the workers, so they inherit the loaded model and share
+    its memory-mapped pages. Each worker starts accepting connections as soon
+    as its lifespan starts and warms up in the background, answering /health
+    with 503 until that is done. The parent supervises: a worker that exits
+    is forked again (after RESPAWN_BACKOFF if it died young) until SIGTERM or
+    SIGINT, after which nothing is restarted. SIGTERM is forwarded to every
+    worker, which stops accepting and drains in-flight requests for up to
+    timeout_graceful_shutdown seconds.
+    """
+    settings = production_settings(load_config(config_path))
+    workers = settings["workers"]
+
+    import main  # Preload before forking
+
+    if workers == 1 or not hasattr(os, "fork"):
+        # Single process, or no fork() (Windows): uvicorn's own worker
+        # processes each load the model themselves
+        uvicorn.run("main:app" if workers > 1 else main.app, host=settings["host"], port=settings["port"],
+                    workers=workers if workers > 1 else None, log_level=settings["log_level"],
+                    timeout_graceful_shutdown=settings["timeout_graceful_shutdown"],
+                    timeout_keep_alive=settings["timeout_keep_alive"], backlog=settings["backlog"])
+        return
+
+    family = socket.AF_INET6 if ":" in settings["host"] else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((settings["host"], settings["port"]))
+    sock.listen(settings["backlog"])
+    sock.set_inheritable(True)
+
+    children: Dict[int, Tuple[int, float]] = {}  # pid -> (worker id, start time)
+    stopping = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: drop the parent's handlers so uvicorn installs its own
+            # for SIGINT/SIGTERM. The id gives each worker its own log file
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            os.environ["MCP_WORKER_ID"] = str(worker_id)
+            uvicorn.Server(_uvicorn_config(main.app, settings)).run(sockets=[sock])
+            os._exit(0)
+        children[pid] = (worker_id, time.monotonic())
+        if stopping:
+            # The signal arrived while this worker was being forked
+            os.kill(pid, signal.SIGTERM)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # Ctrl+C already reaches the workers through the process group;
+        # SIGTERM from a process manager only reaches us, so pass it on
+        if signum == signal.SIGTERM:
+            for child in list(children):
+                try:
+                    os.kill(child, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker_id in range(workers):
+        if not stopping:
+            spawn(worker_id)
+
+    print(f"Serving on http://{settings['host']}:{settings['port']} with {workers} workers")
+
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        worker_id, started = children.pop(pid)
+        if stopping:
+            continue
+        print(f"Worker {worker_id} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < RESPAWN_BACKOFF:
+            time.sleep(RESPAWN_BACKOFF)
+        if not stopping:
+            spawn(worker_id)
+    sock.close()
+
+
+if __name__ == "__main__":
+    run_production()
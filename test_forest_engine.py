@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_engine import FlatForest, verify_against
+from model_artifact import load_artifact, save_artifact
+from prediction_table import FEATURES
+from train_model import load_data
+from vocab_encoder import vocabularies_from_encoders
+
+# Unlimited depth gives pure leaves; the shallow, min_samples_leaf=2 forest
+# has mixed leaf probabilities and so exercises the float sums
+CONFIGS = {
+    "deep": dict(n_estimators=25, max_depth=None, min_samples_leaf=1),
+    "shallow": dict(n_estimators=40, max_depth=4, min_samples_leaf=2),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    X, y, encoders = load_data("clothing_combinations.csv")
+    shape = tuple(len(encoders[feature].classes_) for feature in FEATURES)
+    grid = np.indices(shape).reshape(len(shape), -1).T
+    return X, y, encoders, grid
+
+
+@pytest.fixture(scope="module", params=list(CONFIGS))
+def model(request, data):
+    X, y, _, _ = data
+    return RandomForestClassifier(random_state=0, **CONFIGS[request.param]).fit(X, y)
+
+
+@pytest.fixture(params=["exported", "compact"])
+def forest(request, model):
+    forest = FlatForest.from_sklearn(model)
+    return forest.compact() if request.param == "compact" else forest
+
+
+def test_matches_sklearn_on_every_vocabulary_combination(model, forest, data):
+    grid = data[3]
+    np.testing.assert_array_equal(forest.classes_, model.classes_)
+    assert np.array_equal(forest.predict_proba(grid), model.predict_proba(grid))
+    assert np.array_equal(forest.predict(grid), model.predict(grid))
+
+
+def test_matches_sklearn_one_row_at_a_time(model, forest, data):
+    grid = data[3]
+    rows = grid[np.random.default_rng(0).choice(len(grid), size=50, replace=False)]
+    for row in rows:
+        assert verify_against(model, forest, row[None, :])
+        # A bare 1-d row is treated as one sample
+        assert np.array_equal(forest.predict_proba(row), model.predict_proba(row[None, :]))
+
+
+def test_compact_forest_is_smaller(model):
+    forest = FlatForest.from_sklearn(model)
+    compact = forest.compact()
+    assert compact.n_estimators == forest.n_estimators
+    assert len(compact.feature) < len(forest.feature)
+    assert compact.nbytes < forest.nbytes
+    assert compact.threshold.dtype.kind == "i"
+    # Only the distinct leaf probabilities are kept
+    assert len(compact.leaf_proba) == len(np.unique(forest.leaf_proba[forest.left == np.arange(len(forest.left))],
+                                                    axis=0))
+
+
+def test_forest_indexes_its_stored_arrays_without_copies(model, data, tmp_path, monkeypatch):
+    _, _, encoders, grid = data
+    save_artifact(str(tmp_path), FlatForest.from_sklearn(model).compact(), vocabularies_from_encoders(encoders))
+    loaded = load_artifact(str(tmp_path)).model
+    names = ('roots', 'feature', 'left', 'right')
+    stored = [loaded.arrays()[name] for name in names]
+    assert all(isinstance(array, np.memmap) and getattr(loaded, name) is array for name, array in zip(names, stored))
+
+    # Small traversals index the stored arrays; larger ones widen them for the call
+    assert all(array is original for array, original in zip(loaded.index_arrays(0), stored))
+    assert all(array.dtype == np.intp for array in loaded.index_arrays(len(grid)))
+    assert np.array_equal(loaded.predict_proba(grid), model.predict_proba(grid))
+    monkeypatch.setattr(loaded, "index_arrays", lambda n_rows: tuple(stored))
+    assert np.array_equal(loaded.predict_proba(grid), model.predict_proba(grid))
+
+
+def test_compacting_twice_changes_nothing(model):
+    once = FlatForest.from_sklearn(model).compact()
+    twice = once.compact()
+    for name, array in once.arrays().items():
+        assert array.dtype == twice.arrays()[name].dtype
+        np.testing.assert_array_equal(array, twice.arrays()[name])
+
+
+def test_compact_forest_rejects_fractional_codes(model):
+    compact = FlatForest.from_sklearn(model).compact()
+    with pytest.raises(ValueError):
+        compact.predict_proba([[0.5, 1, 1, 1]])
+    # Whole numbers given as floats are fine
+    assert np.array_equal(compact.predict_proba([[1.0, 2.0, 0.0, 1.0]]), compact.predict_proba([[1, 2, 0, 1]]))
+
+
+def test_compact_forest_survives_an_artifact_round_trip(model, data, tmp_path):
+    _, _, encoders, grid = data
+    compact = FlatForest.from_sklearn(model).compact()
+    save_artifact(str(tmp_path), compact, vocabularies_from_encoders(encoders))
+
+    loaded = load_artifact(str(tmp_path)).model
+    for name, array in compact.arrays().items():
+        assert loaded.arrays()[name].dtype == array.dtype
+    assert np.array_equal(loaded.predict_proba(grid), model.predict_proba(grid))
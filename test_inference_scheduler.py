@@ -0,0 +1,151 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from inference_scheduler import InferenceScheduler
+
+
+class RecordingPredictor:
+    """predict_batch stand-in: prediction is the row's first value, confidence its sum"""
+
+    def __init__(self):
+        self.calls = []
+        self.threads = set()
+
+    def __call__(self, model, X):
+        X = np.asarray(X)
+        self.calls.append((model, len(X)))
+        self.threads.add(threading.get_ident())
+        return X[:, 0], X.sum(axis=1) / 100.0
+
+
+def test_concurrent_submits_share_one_batch_off_the_event_loop():
+    predictor = RecordingPredictor()
+    scheduler = InferenceScheduler(predictor, max_batch_size=8, max_wait_us=50_000)
+
+    async def run():
+        rows = [[i, 1, 2, 3] for i in range(5)]
+        return await asyncio.gather(*(scheduler.submit("model", row) for row in rows))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+
+    # Every caller gets its own row back, from a single model call
+    assert results == [(i, (i + 6) / 100.0) for i in range(5)]
+    assert predictor.calls == [("model", 5)]
+    assert threading.get_ident() not in predictor.threads
+
+
+def test_full_batch_flushes_without_waiting():
+    predictor = RecordingPredictor()
+    # A wait far longer than the test: only reaching max_batch_size can flush
+    scheduler = InferenceScheduler(predictor, max_batch_size=4, max_wait_us=60_000_000)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(scheduler.submit("model", [i, 0, 0, 0]) for i in range(4))), timeout=5)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+
+    assert [prediction for prediction, _ in results] == [0, 1, 2, 3]
+    assert predictor.calls == [("model", 4)]
+
+
+def test_rows_for_different_models_are_never_batched_together():
+    predictor = RecordingPredictor()
+    scheduler = InferenceScheduler(predictor, max_batch_size=8, max_wait_us=50_000)
+
+    async def run():
+        return await asyncio.gather(
+            scheduler.submit("old", [1, 0, 0, 0]),
+            scheduler.submit("new", [2, 0, 0, 0]),
+            scheduler.submit("old", [3, 0, 0, 0]),
+        )
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+
+    assert [prediction for prediction, _ in results] == [1, 2, 3]
+    assert sorted(predictor.calls) == [("new", 1), ("old", 2)]
+
+
+def test_batch_failure_reaches_every_caller():
+    def failing(model, X):
+        raise RuntimeError("model failed")
+
+    scheduler = InferenceScheduler(failing, max_batch_size=8, max_wait_us=1000)
+
+    async def run():
+        return await asyncio.gather(*(scheduler.submit("model", [i, 0, 0, 0]) for i in range(3)),
+                                    return_exceptions=True)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        scheduler.shutdown()
+
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_submit_many_scores_the_whole_array_in_one_call():
+    predictor = RecordingPredictor()
+    scheduler = InferenceScheduler(predictor)
+    X = np.arange(12).reshape(3, 4)
+
+    try:
+        predictions, confidences = asyncio.run(scheduler.submit_many("model", X))
+    finally:
+        scheduler.shutdown()
+
+    np.testing.assert_array_equal(predictions, [0, 4, 8])
+    assert predictor.calls == [("model", 3)]
+
+
+def test_scheduler_can_be_used_again_after_shutdown():
+    predictor = RecordingPredictor()
+    scheduler = InferenceScheduler(predictor, max_wait_us=0)
+    scheduler.shutdown()
+
+    try:
+        assert asyncio.run(scheduler.submit("model", [7, 0, 0, 0]))[0] == 7
+    finally:
+        scheduler.shutdown()
+
+
+def test_shutdown_scores_rows_still_waiting_for_a_batch():
+    predictor = RecordingPredictor()
+    scheduler = InferenceScheduler(predictor, max_batch_size=8, max_wait_us=60_000_000)
+
+    async def run():
+        waiting = [asyncio.ensure_future(scheduler.submit("model", [i, 0, 0, 0])) for i in range(3)]
+        await asyncio.sleep(0)
+        scheduler.shutdown()
+        # No flush is left scheduled to start a new pool after shutdown
+        assert scheduler._flush_handle is None and scheduler._executor is None
+        return await asyncio.wait_for(asyncio.gather(*waiting), timeout=5)
+
+    results = asyncio.run(run())
+    assert [prediction for prediction, _ in results] == [0, 1, 2]
+    assert predictor.calls == [("model", 3)]
+    assert scheduler._executor is None
+
+
+def test_cancelled_batch_cancels_its_callers():
+    async def run():
+        loop = asyncio.get_running_loop()
+        callers = [loop.create_future() for _ in range(2)]
+        batch = loop.create_future()
+        batch.cancel()
+        InferenceScheduler._resolve([([0], future) for future in callers], batch)
+        return callers
+
+    assert all(future.cancelled() for future in asyncio.run(run()))
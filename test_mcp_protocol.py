@@ -0,0 +1,152 @@
+import asyncio
+import io
+import json
+
+from mcp_protocol import (INTERNAL_ERROR, INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, PARSE_ERROR,
+                          PROTOCOL_VERSIONS, MCPServer)
+
+TOOLS = [{"name": "echo", "description": "Echo the arguments", "inputSchema": {"type": "object"}}]
+
+
+class Tools:
+    """call_tool stand-in: 'echo' returns its arguments after an optional delay, counting overlap"""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, name, arguments):
+        if name == "broken":
+            raise RuntimeError("tool crashed")
+        if name != "echo":
+            raise KeyError(name)
+        if "bad" in arguments:
+            raise ValueError("bad argument")
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(arguments.get("delay", 0))
+        finally:
+            self.running -= 1
+        return {"echo": arguments}
+
+
+def make_server():
+    tools = Tools()
+    return MCPServer("test", "1.0", lambda: TOOLS, tools), tools
+
+
+def call(request_id, **arguments):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": "echo", "arguments": arguments}}
+
+
+def test_initialize_negotiates_the_protocol_version():
+    server, _ = make_server()
+    oldest = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"protocolVersion": PROTOCOL_VERSIONS[-1]}}
+    unknown = {"jsonrpc": "2.0", "id": 2, "method": "initialize", "params": {"protocolVersion": "1999-01-01"}}
+
+    response = asyncio.run(server.handle_message(oldest))
+    assert response["id"] == 1
+    assert response["result"]["protocolVersion"] == PROTOCOL_VERSIONS[-1]
+    assert response["result"]["serverInfo"] == {"name": "test", "version": "1.0"}
+    assert asyncio.run(server.handle_message(unknown))["result"]["protocolVersion"] == PROTOCOL_VERSIONS[0]
+
+
+def test_tools_list_and_call():
+    server, _ = make_server()
+    listed = asyncio.run(server.handle_message({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}))
+    assert listed["result"] == {"tools": TOOLS}
+
+    result = asyncio.run(server.handle_message(call(2, x=1)))["result"]
+    assert result["isError"] is False
+    assert result["structuredContent"] == {"echo": {"x": 1}}
+    assert json.loads(result["content"][0]["text"]) == {"echo": {"x": 1}}
+
+
+def test_tool_failures():
+    server, _ = make_server()
+
+    def tool_call(name, arguments):
+        message = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+        return asyncio.run(server.handle_message(message))
+
+    # Unknown tools are a protocol error, bad arguments a result the model can read
+    assert tool_call("missing", {})["error"]["code"] == INVALID_PARAMS
+    assert tool_call("echo", {"bad": 1})["result"] == {"content": [{"type": "text", "text": "bad argument"}],
+                                                       "isError": True}
+    assert tool_call("broken", {})["error"]["code"] == INTERNAL_ERROR
+    assert tool_call(None, {})["error"]["code"] == INVALID_PARAMS
+
+
+def test_invalid_messages_notifications_and_unknown_methods():
+    server, _ = make_server()
+    handle = lambda message: asyncio.run(server.handle_message(message))
+
+    assert handle([1])["error"]["code"] == INVALID_REQUEST
+    assert handle({"id": 1, "method": "ping"})["error"]["code"] == INVALID_REQUEST
+    assert handle({"jsonrpc": "2.0", "id": 1, "method": "ping", "params": []})["error"]["code"] == INVALID_REQUEST
+    assert handle({"jsonrpc": "2.0", "id": 1, "method": "resources/list"})["error"]["code"] == METHOD_NOT_FOUND
+    assert handle({"jsonrpc": "2.0", "id": 1, "method": "ping"}) == {"jsonrpc": "2.0", "id": 1, "result": {}}
+    # Nothing answers a notification or a client's response
+    assert handle({"jsonrpc": "2.0", "method": "notifications/initialized"}) is None
+    assert handle({"jsonrpc": "2.0", "method": "tools/call", "params": {"name": "echo"}}) is None
+    assert handle({"jsonrpc": "2.0", "id": 5, "result": {}}) is None
+
+
+def test_batch_calls_run_concurrently_and_skip_notifications():
+    server, tools = make_server()
+    batch = [call(1, delay=0.05), {"jsonrpc": "2.0", "method": "notifications/initialized"}, call(2, delay=0.01)]
+
+    responses = asyncio.run(server.handle_payload(batch))
+    assert [response["id"] for response in responses] == [1, 2]
+    assert tools.max_running == 2
+
+    assert asyncio.run(server.handle_payload([]))["error"]["code"] == INVALID_REQUEST
+    assert asyncio.run(server.handle_payload([{"jsonrpc": "2.0", "method": "notifications/initialized"}])) is None
+
+
+def test_handle_bytes_reports_parse_errors():
+    server, _ = make_server()
+    response = json.loads(asyncio.run(server.handle_bytes(b"{not json")))
+    assert response == {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error"}}
+    assert json.loads(asyncio.run(server.handle_bytes(json.dumps(call(1)).encode())))["id"] == 1
+
+
+def test_stream_batch_sends_each_response_when_ready():
+    server, _ = make_server()
+    batch = [call(1, delay=0.05), call(2, delay=0), {"jsonrpc": "2.0", "method": "notifications/initialized"}]
+
+    async def run():
+        return [event async for event in server.stream_batch(batch)]
+
+    events = asyncio.run(run())
+    assert all(event.startswith(b"event: message\ndata: ") and event.endswith(b"\n\n") for event in events)
+    ids = [json.loads(event.split(b"data: ", 1)[1])["id"] for event in events]
+    assert ids == [2, 1]
+
+
+def test_serve_stdio_answers_each_line_as_soon_as_it_is_ready():
+    server, _ = make_server()
+    lines = [call(1, delay=0.05), call(2, delay=0), {"jsonrpc": "2.0", "method": "notifications/initialized"}]
+    stdin = io.BytesIO(b"".join(json.dumps(line).encode() + b"\n\n" for line in lines) + b"{oops\n")
+    stdout = io.BytesIO()
+
+    asyncio.run(server.serve_stdio(stdin, stdout))
+
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    # The slow call doesn't hold up the ones read after it
+    assert [response["id"] for response in responses][-1] == 1
+    assert sorted(response["id"] for response in responses if response["id"] is not None) == [1, 2]
+    assert [response["error"]["code"] for response in responses if "error" in response] == [PARSE_ERROR]
+
+
+def test_serve_stdio_limits_messages_in_flight():
+    server, tools = make_server()
+    stdin = io.BytesIO(b"".join(json.dumps(call(i, delay=0.01)).encode() + b"\n" for i in range(6)))
+    stdout = io.BytesIO()
+
+    asyncio.run(server.serve_stdio(stdin, stdout, max_in_flight=2))
+
+    assert len(stdout.getvalue().splitlines()) == 6
+    assert tools.max_running <= 2
@@ -0,0 +1,95 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_engine import FlatForest
+from model_artifact import save_artifact
+from model_holder import ModelVersion
+from prediction_table import build_prediction_table
+from train_model import load_data
+from vocab_encoder import vocabularies_from_encoders
+
+# The fixed part of each request, from nothing beyond the required fields
+# (two free fields) to both recommended fields (none free)
+PARTIAL_OUTFITS = {
+    "recommend_bottoms": [
+        {"top_type": "shirt", "top_color": "white"},
+        {"top_type": "shirt", "top_color": "white", "bottom_type": "jeans"},
+        {"top_type": "shirt", "top_color": "white", "bottom_type": "jeans", "bottom_color": "blue"},
+    ],
+    "recommend_tops": [
+        {"bottom_type": "jeans", "bottom_color": "blue"},
+        {"bottom_type": "jeans", "bottom_color": "blue", "top_color": "white"},
+        {"bottom_type": "jeans", "bottom_color": "blue", "top_type": "shirt", "top_color": "white"},
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    # main loads its model at import, so point it at a freshly trained artifact
+    X, y, encoders = load_data("clothing_combinations.csv")
+    forest = FlatForest.from_sklearn(RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)).compact()
+    vocabularies = vocabularies_from_encoders(encoders)
+    directory = str(tmp_path_factory.mktemp("artifact"))
+    save_artifact(directory, forest, vocabularies, build_prediction_table(forest, vocabularies))
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("MODEL_ARTIFACT_DIR", directory)
+        patch.setenv("MODEL_WATCH_INTERVAL", "0")
+        patch.setenv("WARMUP", "0")
+        sys.modules.pop("main", None)
+        module = importlib.import_module("main")
+    yield module
+    module.inference_scheduler.shutdown()
+
+
+@pytest.fixture(params=["table", "live"])
+def active(request, main, monkeypatch):
+    current = main.model_holder.current
+    if request.param == "live":
+        current = ModelVersion(current.version + "-live", current.model, current.vocabularies, None, current.source)
+        monkeypatch.setattr(main.model_holder, "current", current)
+    return current
+
+
+def recommend(main, action, outfit):
+    return asyncio.run(main.run_action(action, {**outfit, "k": 100, "min_score": 0}))
+
+
+@pytest.mark.parametrize("action", list(PARTIAL_OUTFITS))
+@pytest.mark.parametrize("n_fixed", [0, 1, 2])
+def test_recommendations_with_any_number_of_free_fields(main, active, action, n_fixed):
+    outfit = PARTIAL_OUTFITS[action][n_fixed]
+    result = recommend(main, action, outfit)
+    recommendations = result["recommendations"]
+
+    free = [feature for feature in main.RECOMMEND_ACTIONS[action][1] if feature not in outfit]
+    expected = 1
+    for feature in free:
+        expected *= len(active.vocabularies[feature])
+    assert len(recommendations) == min(expected, 100)
+    assert result["message"] == f"Found {len(recommendations)} recommendation(s)"
+
+    confidences = [recommendation["confidence"] for recommendation in recommendations]
+    assert confidences == sorted(confidences, reverse=True)
+    for recommendation in recommendations:
+        # Fixed fields come back as given; the whole outfit scores as reported
+        fields = {feature: value for feature, value in recommendation.items() if feature != "confidence"}
+        assert all(fields[feature] == outfit[feature] for feature in fields if feature in outfit)
+        scored = main.score_outfit({**outfit, **fields}, active)
+        assert scored["confidence"] == round(recommendation["confidence"], 2)
+
+
+@pytest.mark.parametrize("action", list(PARTIAL_OUTFITS))
+def test_live_model_matches_the_table(main, action, monkeypatch):
+    table = main.model_holder.current
+    live = ModelVersion(table.version + "-live", table.model, table.vocabularies, None, table.source)
+    for outfit in PARTIAL_OUTFITS[action]:
+        from_table = recommend(main, action, outfit)
+        monkeypatch.setattr(main.model_holder, "current", live)
+        assert recommend(main, action, outfit) == from_table
+        monkeypatch.setattr(main.model_holder, "current", table)
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from response_cache import ResponseCache, outfit_cache_key
+
+
+class CountingCompute:
+    """An async computation that takes a while and counts how often it ran"""
+
+    def __init__(self, delay: float = 0.02, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"call": self.calls}
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResponseCache()
+    compute = CountingCompute()
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert compute.calls == 1
+    assert all(result is results[0] for result in results)
+    assert cache.stats()["coalesced"] == 9
+
+    # Later calls are plain hits
+    assert asyncio.run(cache.get_or_compute("key", compute)) is results[0]
+    assert compute.calls == 1
+
+
+def test_different_keys_compute_separately():
+    cache = ResponseCache()
+    compute = CountingCompute()
+
+    async def run():
+        return await asyncio.gather(cache.get_or_compute("a", compute), cache.get_or_compute("b", compute))
+
+    asyncio.run(run())
+    assert compute.calls == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = ResponseCache()
+    failing = CountingCompute(error=RuntimeError("boom"))
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key", failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert failing.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    working = CountingCompute()
+    assert asyncio.run(cache.get_or_compute("key", working)) == {"call": 1}
+
+
+def test_cancelled_leader_does_not_fail_its_waiters():
+    cache = ResponseCache()
+    compute = CountingCompute(delay=0.05)
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    # One waiter took over the computation and the others joined it
+    assert compute.calls == 2
+    assert results == [{"call": 2}] * 3
+
+
+def test_cancelled_waiter_does_not_cancel_the_computation():
+    cache = ResponseCache()
+    compute = CountingCompute(delay=0.05)
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == {"call": 1}
+    assert cache.get("key") == {"call": 1}
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_size=2, ttl=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_version_change_clears_the_cache():
+    version = [1]
+    cache = ResponseCache(version=lambda: version[0], check_interval=0)
+    cache.put("key", "old")
+    assert cache.get("key") == "old"
+
+    version[0] = 2
+    assert cache.get("key") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_outfit_cache_key():
+    outfit = {"top_type": "shirt", "top_color": "white", "bottom_type": "jeans", "bottom_color": "blue", "x": 1}
+    assert outfit_cache_key(outfit) == ("shirt", "white", "jeans", "blue")
+    assert outfit_cache_key({"top_type": 1}) is None
@@ -0,0 +1,242 @@
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# W3C trace context: version-trace_id-parent_id-flags
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """
+    One timed operation in a trace. Spans of a request share one list,
+    which is exported when the request's root span ends. Times are wall
+    clock nanoseconds, derived from perf_counter against the root's anchor
+    so stage timers can pass in the values they already measured.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "start_ns", "end_ns",
+                 "attributes", "finished", "anchor", "token")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, service: str,
+                 finished: List[Dict[str, Any]], anchor, perf_start: float):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.finished = finished
+        self.anchor = anchor  # (wall ns, perf_counter) taken together at the root
+        self.start_ns = anchor[0] + int((perf_start - anchor[1]) * 1e9)
+        self.end_ns = None
+        self.attributes: Dict[str, Any] = {}
+        self.token = None
+
+    def end(self, perf_end: float):
+        self.end_ns = self.anchor[0] + int((perf_end - self.anchor[1]) * 1e9)
+        self.finished.append({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 4),
+            "attributes": self.attributes,
+        })
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+# The innermost open span of the current request; None when it isn't traced
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_child_span(name: str, perf_start: float, service: Optional[str] = None) -> Optional[Span]:
+    """
+    Open a span under the current one, or return None if nothing is being
+    traced. It belongs to the parent's service unless another is given.
+    """
+    parent = current_span.get()
+    if parent is None:
+        return None
+    span = Span(parent.trace_id, parent.span_id, name, service or parent.service, parent.finished, parent.anchor,
+                perf_start)
+    span.token = current_span.set(span)
+    return span
+
+
+def end_child_span(span: Span, perf_end: float):
+    current_span.reset(span.token)
+    span.end(perf_end)
+
+
+class span:
+    """
+    Context manager for a child span outside the metrics stages; free when
+    not tracing. service moves it, and the spans opened inside it, to
+    another service, e.g. for a call into another app in the same process.
+    """
+
+    __slots__ = ("name", "service", "attributes", "span")
+
+    def __init__(self, name: str, service: Optional[str] = None, **attributes):
+        self.name = name
+        self.service = service
+        self.attributes = attributes
+
+    def __enter__(self) -> Optional[Span]:
+        self.span = start_child_span(self.name, time.perf_counter(), self.service)
+        if self.span is not None:
+            self.span.attributes.update(self.attributes)
+        return self.span
+
+    def __exit__(self, *exc):
+        if self.span is not None:
+            end_child_span(self.span, time.perf_counter())
+        return False
+
+
+def inject_headers() -> Dict[str, str]:
+    """traceparent header for an outgoing call, so the callee joins this trace"""
+    current = current_span.get()
+    return {"traceparent": current.traceparent()} if current is not None else {}
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a traceparent header, or None"""
+    match = TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+# === Exporters ===
+
+class InMemoryCollector:
+    """The most recent traces, one list of spans per traced request"""
+
+    def __init__(self, capacity: int = 1000):
+        self.traces = deque(maxlen=max(1, capacity))
+
+    def export(self, spans: List[Dict[str, Any]]):
+        self.traces.append(spans)
+
+    def find(self, trace_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Recent traces, newest first, with spans from every service in this process merged"""
+        merged: Dict[str, List[Dict[str, Any]]] = {}
+        for spans in reversed(self.traces):
+            if not spans or (trace_id and spans[0]["trace_id"] != trace_id):
+                continue
+            if spans[0]["trace_id"] not in merged and len(merged) >= limit:
+                continue
+            merged.setdefault(spans[0]["trace_id"], []).extend(spans)
+        return [{"trace_id": key, "spans": sorted(spans, key=lambda s: s["start_time_unix_nano"])}
+                for key, spans in merged.items()]
+
+
+class FileExporter:
+    """Spans appended to a JSON-lines file by a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = None
+
+    def export(self, spans: List[Dict[str, Any]]):
+        if self._thread is None:
+            # Started on first use, so it exists in forked workers too
+            self._thread = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+            self._thread.start()
+        self._queue.put(spans)
+
+    def _write(self):
+        while True:
+            spans = self._queue.get()
+            lines = "".join(json.dumps(s) + "\n" for s in spans)
+            while not self._queue.empty():
+                lines += "".join(json.dumps(s) + "\n" for s in self._queue.get())
+            # One append per batch; O_APPEND keeps lines from both apps whole
+            with open(self.path, "a") as file:
+                file.write(lines)
+
+
+# One collector per process, shared by every app in it, so a trace through
+# Bee and main.py in the same process reads back as one
+_collector = InMemoryCollector(int(os.environ.get("TRACE_CAPACITY", 1000)))
+_file_exporter: Optional[FileExporter] = None
+
+
+def exporter_from_env():
+    """TRACING=memory or file (TRACE_FILE, default traces.jsonl); anything else disables tracing"""
+    global _file_exporter
+    mode = os.environ.get("TRACING", "off")
+    if mode == "memory":
+        return _collector
+    if mode == "file":
+        if _file_exporter is None:
+            _file_exporter = FileExporter(os.environ.get("TRACE_FILE", "traces.jsonl"))
+        return _file_exporter
+    return None
+
+
+def collector() -> InMemoryCollector:
+    return _collector
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per request. An incoming
+    traceparent header makes it a child of the caller's span and its
+    sampled flag is followed; otherwise sample_rate decides. The stage
+    timers and span() add children, and the whole trace is exported when
+    the response is done. Only installed when tracing is on.
+    """
+
+    def __init__(self, app, service: str, exporter, sample_rate: float = 1.0):
+        self.app = app
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = next((value for name, value in scope["headers"] if name == b"traceparent"), None)
+        parent = parse_traceparent(header.decode("latin-1")) if header else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < self.sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        perf_start = time.perf_counter()
+        root = Span(trace_id, parent_id, f"{scope['method']} {scope['path']}", self.service, [],
+                    (time.time_ns(), perf_start), perf_start)
+        root.attributes.update({"http.method": scope["method"], "http.path": scope["path"]})
+        token = current_span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_span.reset(token)
+            root.end(time.perf_counter())
+            self.exporter.export(root.finished)
@@ -1,32 +1,214 @@
+import argparse
+import itertools
+import json
+import os
+import time
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, cross_validate
 from sklearn.preprocessing import LabelEncoder
 import pickle
+from forest_engine import FlatForest, verify_against
+from model_artifact import save_artifact, DEFAULT_ARTIFACT_DIR
+from prediction_table import build_prediction_table, FEATURES
+from vocab_encoder import vocabularies_from_encoders
 
-# Load data
-df = pd.read_csv('clothing_combinations.csv')
+# Grid swept by default; every value can be overridden on the command line
+DEFAULT_GRID = {
+    'n_estimators': [10, 25, 50, 100, 200],
+    'max_depth': [None, 4, 8],
+    'min_samples_leaf': [1, 2],
+    'max_features': ['sqrt'],
+}
 
-# Encode categorical features
-encoders = {}
-for column in ['top_type', 'top_color', 'bottom_type', 'bottom_color']:
-    le = LabelEncoder()
-    df[column + '_encoded'] = le.fit_transform(df[column])
-    encoders[column] = le
+# Rows per call for the batch latency measurement
+LATENCY_BATCH_SIZE = 256
 
-# Prepare features and target
-X = df[['top_type_encoded', 'top_color_encoded', 'bottom_type_encoded', 'bottom_color_encoded']]
-y = df['good_combination']
 
-# Train Random Forest model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X, y)
+def load_data(path='clothing_combinations.csv'):
+    """Encoded features, labels and the fitted LabelEncoders"""
+    df = pd.read_csv(path)
 
-# Save model and encoders
-with open('clothing_combo_model.pkl', 'wb') as file:
-    pickle.dump(model, file)
+    # Encode categorical features
+    encoders = {}
+    for column in FEATURES:
+        le = LabelEncoder()
+        df[column + '_encoded'] = le.fit_transform(df[column])
+        encoders[column] = le
 
-with open('encoders.pkl', 'wb') as file:
-    pickle.dump(encoders, file)
+    X = df[[column + '_encoded' for column in FEATURES]].to_numpy()
+    y = df['good_combination'].to_numpy()
+    return X, y, encoders
 
-print("Model trained and saved successfully!")
\ No newline at end of file
+
+def parse_grid_values(text, cast):
+    """'10,50,none' -> [10, 50, None]"""
+    return [None if value.strip().lower() == 'none' else cast(value.strip()) for value in text.split(',')]
+
+
+def measure_latency(forest, grid_rows, repeat):
+    """p50 microseconds for one-row and LATENCY_BATCH_SIZE-row predict_proba on the serving engine"""
+    rng = np.random.default_rng(0)
+    batch = grid_rows[rng.choice(len(grid_rows), size=LATENCY_BATCH_SIZE)]
+
+    def p50_us(X):
+        forest.predict_proba(X)  # Warm up
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            forest.predict_proba(X)
+            samples.append((time.perf_counter() - start) * 1_000_000)
+        return float(np.median(samples))
+
+    return p50_us(batch[:1]), p50_us(batch)
+
+
+def forest_size(forest):
+    return {'trees': int(len(forest.roots)), 'nodes': int(len(forest.feature)), 'max_depth': int(forest.max_depth),
+            'bytes': int(forest.nbytes)}
+
+
+def mark_pareto_front(results):
+    """Flag configs no other config beats on both accuracy and single-row latency"""
+    for result in results:
+        result['pareto'] = not any(
+            other['cv_accuracy'] >= result['cv_accuracy'] and other['latency_single_us'] <= result['latency_single_us']
+            and (other['cv_accuracy'] > result['cv_accuracy'] or other['latency_single_us'] < result['latency_single_us'])
+            for other in results
+        )
+
+
+def select_best(results, latency_budget_us=None):
+    """Most accurate config within the single-row latency budget; ties go to the faster one"""
+    eligible = [result for result in results
+                if latency_budget_us is None or result['latency_single_us'] <= latency_budget_us]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda result: (result['cv_accuracy'], -result['latency_single_us']))
+
+
+def sweep(X, y, grid, vocabulary_sizes, cv_folds=5, n_jobs=-1, repeat=200, random_state=42):
+    """
+    Cross-validate every config in the grid (folds fitted in parallel) and
+    time the flattened forest that would be served. Returns one result per
+    config, plus the config's model refitted on all the data.
+    """
+    # Can't have more folds than examples of the rarest class
+    folds = max(2, min(cv_folds, int(np.bincount(y).min())))
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    grid_rows = np.indices(vocabulary_sizes).reshape(len(vocabulary_sizes), -1).T
+
+    names = list(grid)
+    results, models = [], []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        estimator = RandomForestClassifier(random_state=random_state, **params)
+
+        start = time.perf_counter()
+        scores = cross_validate(estimator, X, y, cv=splitter, n_jobs=n_jobs)
+        cv_seconds = time.perf_counter() - start
+
+        model = RandomForestClassifier(random_state=random_state, n_jobs=n_jobs, **params).fit(X, y)
+        forest = FlatForest.from_sklearn(model).compact()
+        single_us, batch_us = measure_latency(forest, grid_rows, repeat)
+
+        results.append({
+            'params': params,
+            'cv_accuracy': round(float(np.mean(scores['test_score'])), 4),
+            'cv_accuracy_std': round(float(np.std(scores['test_score'])), 4),
+            'cv_folds': folds,
+            'cv_seconds': round(cv_seconds, 3),
+            'latency_single_us': round(single_us, 2),
+            f'latency_batch_{LATENCY_BATCH_SIZE}_us': round(batch_us, 2),
+            **forest_size(forest),
+        })
+        models.append(model)
+        print(f"{json.dumps(params):80s} accuracy {results[-1]['cv_accuracy']:.3f}  "
+              f"single {single_us:8.1f} us  batch {batch_us:9.1f} us")
+
+    mark_pareto_front(results)
+    return results, models
+
+
+def export(model, encoders, training=None):
+    """Pickles for compatibility, plus the memory-mapped artifact the server loads"""
+    # Save model and encoders
+    with open('clothing_combo_model.pkl', 'wb') as file:
+        pickle.dump(model, file)
+
+    with open('encoders.pkl', 'wb') as file:
+        pickle.dump(encoders, file)
+
+    # Memory-mappable artifact for the serving path: the compacted forest, the
+    # vocabularies and the precomputed prediction table
+    vocabularies = vocabularies_from_encoders(encoders)
+    forest = FlatForest.from_sklearn(model).compact()
+    shape = tuple(len(vocabularies[feature]) for feature in FEATURES)
+    if not verify_against(model, forest, np.indices(shape).reshape(len(shape), -1).T):
+        raise RuntimeError("Compacted forest doesn't reproduce the model's predictions")
+    manifest = save_artifact(DEFAULT_ARTIFACT_DIR, forest, vocabularies,
+                             build_prediction_table(forest, vocabularies), training=training)
+    print(f"Model artifact {manifest['model_version']} written to {DEFAULT_ARTIFACT_DIR}/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep random forest sizes and export the best one")
+    parser.add_argument('--csv', default='clothing_combinations.csv')
+    parser.add_argument('--n-estimators', default=','.join(map(str, DEFAULT_GRID['n_estimators'])),
+                        help="Comma-separated values to sweep")
+    parser.add_argument('--max-depth', default=','.join(str(v).lower() for v in DEFAULT_GRID['max_depth']),
+                        help="Comma-separated values to sweep ('none' for unlimited)")
+    parser.add_argument('--min-samples-leaf', default=','.join(map(str, DEFAULT_GRID['min_samples_leaf'])))
+    parser.add_argument('--max-features', default=','.join(DEFAULT_GRID['max_features']),
+                        help="Comma-separated values: sqrt, log2 or none")
+    parser.add_argument('--cv', type=int, default=5, help="Cross-validation folds (capped by the rarest class)")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Cores for fitting (default: all)")
+    parser.add_argument('--latency-budget-us', type=float,
+                        help="Only export configs whose single-row p50 latency is at most this")
+    parser.add_argument('--repeat', type=int, default=200, help="Calls per latency measurement")
+    parser.add_argument('--report', default='training_report.json')
+    parser.add_argument('--no-export', action='store_true', help="Only write the report")
+    args = parser.parse_args()
+
+    grid = {
+        'n_estimators': parse_grid_values(args.n_estimators, int),
+        'max_depth': parse_grid_values(args.max_depth, int),
+        'min_samples_leaf': parse_grid_values(args.min_samples_leaf, int),
+        'max_features': parse_grid_values(args.max_features, str),
+    }
+
+    X, y, encoders = load_data(args.csv)
+    vocabulary_sizes = tuple(len(encoders[feature].classes_) for feature in FEATURES)
+    results, models = sweep(X, y, grid, vocabulary_sizes, args.cv, args.n_jobs, args.repeat)
+
+    best = select_best(results, args.latency_budget_us)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'rows': int(len(y)),
+        'cpu_count': os.cpu_count(),
+        'latency_budget_us': args.latency_budget_us,
+        'selected': best,
+        'pareto_front': sorted((result for result in results if result['pareto']),
+                               key=lambda result: result['latency_single_us']),
+        'results': results,
+    }
+    with open(args.report, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Report written to {args.report}")
+
+    if best is None:
+        raise SystemExit(f"No configuration is within {args.latency_budget_us} us; see {args.report}")
+    print(f"Selected {json.dumps(best['params'])}: accuracy {best['cv_accuracy']:.3f}, "
+          f"single-row {best['latency_single_us']:.1f} us")
+
+    if not args.no_export:
+        export(models[results.index(best)], encoders, training={
+            'params': best['params'], 'cv_accuracy': best['cv_accuracy'],
+            'latency_single_us': best['latency_single_us'], 'report': args.report,
+        })
+        print("Model trained and saved successfully!")
+
+
+if __name__ == '__main__':
+    main()
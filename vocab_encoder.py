@@ -0,0 +1,82 @@
+from itertools import repeat
+from operator import methodcaller
+
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from prediction_table import FEATURES
+
+
+def vocabularies_from_encoders(encoders: Dict[str, Any], features: Sequence[str] = FEATURES) -> Dict[str, List[str]]:
+    """Each fitted LabelEncoder's classes_ as a plain list, in code order"""
+    return {feature: encoders[feature].classes_.tolist() for feature in features}
+
+
+# Smaller batches are encoded row by row, which is faster for a handful of rows
+VECTORIZE_MIN_ROWS = 16
+
+
+class VocabularyEncoder:
+    """
+    Plain dict lookups compiled from the fitted LabelEncoders' vocabularies.
+
+    LabelEncoder assigns each class its position in the sorted classes_
+    array, so {value: index} gives exactly the same codes without the
+    per-call array building and input validation of transform().
+    """
+
+    def __init__(self, vocabularies: Dict[str, Sequence[str]], features: Sequence[str] = FEATURES):
+        self.features = tuple(features)
+        self.vocabularies = [
+            {value: code for code, value in enumerate(vocabularies[feature])}
+            for feature in self.features
+        ]
+        self._getters = [methodcaller('get', feature, '') for feature in self.features]
+
+    @classmethod
+    def from_encoders(cls, encoders: Dict[str, Any], features: Sequence[str] = FEATURES) -> 'VocabularyEncoder':
+        return cls(vocabularies_from_encoders(encoders, features), features)
+
+    def encode(self, outfit: Dict[str, Any]) -> Optional[List[int]]:
+        """Encode all fields of one outfit, or return None if any is unknown"""
+        codes = []
+        for feature, vocabulary in zip(self.features, self.vocabularies):
+            value = outfit.get(feature, '')
+            code = vocabulary.get(value) if isinstance(value, str) else None
+            if code is None:
+                return None
+            codes.append(code)
+        return codes
+
+    def encode_many(self, outfits: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode a batch one field at a time. Returns an (n, len(features)) array
+        of codes and a mask of the rows where every field was found; non-dict
+        items are invalid.
+        """
+        n = len(outfits)
+        if n < VECTORIZE_MIN_ROWS or not all(isinstance(outfit, dict) for outfit in outfits):
+            return self._encode_rows(outfits)
+
+        # Each column is looked up with map() over dict.get straight into the
+        # array, so the per-value loop runs in C; -1 marks values not found
+        X = np.empty((n, len(self.features)), dtype=np.int64)
+        try:
+            for j, (getter, vocabulary) in enumerate(zip(self._getters, self.vocabularies)):
+                X[:, j] = np.fromiter(map(vocabulary.get, map(getter, outfits), repeat(-1)),
+                                      dtype=np.int64, count=n)
+        except TypeError:
+            # An unhashable value (list, dict, ...); encode() rejects it per row
+            return self._encode_rows(outfits)
+
+        valid = (X >= 0).all(axis=1)
+        X[~valid] = 0
+        return X, valid
+
+    def _encode_rows(self, outfits: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        # Row at a time, for small batches and batches with non-dict items
+        codes = [self.encode(outfit) if isinstance(outfit, dict) else None for outfit in outfits]
+        zeros = [0] * len(self.features)
+        X = np.array([row if row is not None else zeros for row in codes], dtype=np.int64)
+        valid = np.array([row is not None for row in codes], dtype=bool)
+        return X.reshape(len(outfits), len(self.features)), valid